@@ -0,0 +1,176 @@
+import argparse
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+AGGREGATE_FIELDS = ("subject", "year", "paper_type")
+
+
+class AggregateCounters:
+    """Question counts by subject, year and paper type, maintained on every write.
+
+    Each stored question keeps a row with its (subject, year, paper_type), so an insert,
+    re-insert or delete adjusts exactly the counters it affects without reading the
+    collection. Counts live in SQLite next to the vector store and are mirrored in
+    memory, so reads cost the same whatever the corpus size. rebuild() recounts from a
+    paged scan of collection metadata.
+
+    The per-question rows double as a keyset index ordered by id, which page_ids() uses
+    for stable cursor pagination over the collection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS questions (id TEXT PRIMARY KEY, subject TEXT, year TEXT, paper_type TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS counts ("
+            "field TEXT NOT NULL, value TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (field, value))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS questions_subject ON questions (subject, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS questions_year ON questions (year, id)")
+        self._db.commit()
+
+        self._counts: Dict[str, Dict[str, int]] = {field: {} for field in AGGREGATE_FIELDS}
+        for field, value, count in self._db.execute("SELECT field, value, count FROM counts"):
+            self._counts[field][value] = count
+        self.total = self._db.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    @staticmethod
+    def _values(metadata: Dict) -> tuple:
+        return tuple(str(metadata.get(field) or "") for field in AGGREGATE_FIELDS)
+
+    def _bump(self, values: tuple, delta: int) -> None:
+        for field, value in zip(AGGREGATE_FIELDS, values):
+            count = self._counts[field].get(value, 0) + delta
+            if count > 0:
+                self._counts[field][value] = count
+                self._db.execute(
+                    "INSERT OR REPLACE INTO counts (field, value, count) VALUES (?, ?, ?)", (field, value, count)
+                )
+            else:
+                self._counts[field].pop(value, None)
+                self._db.execute("DELETE FROM counts WHERE field = ? AND value = ?", (field, value))
+        self.total += delta
+
+    def _remove(self, id_: str) -> None:
+        row = self._db.execute("SELECT subject, year, paper_type FROM questions WHERE id = ?", (id_,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM questions WHERE id = ?", (id_,))
+            self._bump(row, -1)
+
+    def add(self, ids: Sequence[str], embeddings, metadatas: Sequence[Dict]) -> None:
+        """Count (or re-count) questions; the index listener signature ignores embeddings"""
+        with self._lock:
+            for id_, metadata in zip(ids, metadatas):
+                self._remove(id_)
+                values = self._values(metadata)
+                self._db.execute(
+                    "INSERT INTO questions (id, subject, year, paper_type) VALUES (?, ?, ?, ?)", (id_, *values)
+                )
+                self._bump(values, 1)
+            self._db.commit()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for id_ in ids:
+                self._remove(id_)
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM questions")
+            self._db.execute("DELETE FROM counts")
+            self._db.commit()
+            self._counts = {field: {} for field in AGGREGATE_FIELDS}
+            self.total = 0
+
+    def __len__(self) -> int:
+        return self.total
+
+    def counts(self, field: str) -> Dict[str, int]:
+        """Questions per value of `field`, largest first"""
+        with self._lock:
+            items = list(self._counts[field].items())
+        return dict(sorted(items, key=lambda item: (-item[1], item[0])))
+
+    @staticmethod
+    def _where(subject: Optional[str], year: Optional[int]) -> Tuple[List[str], List]:
+        clauses, params = [], []
+        if subject is not None:
+            clauses.append("subject = ?")
+            params.append(subject)
+        if year is not None:
+            clauses.append("year = ?")
+            params.append(str(year))
+        return clauses, params
+
+    def page_ids(
+        self,
+        limit: int,
+        after: Optional[str] = None,
+        offset: int = 0,
+        subject: Optional[str] = None,
+        year: Optional[int] = None,
+    ) -> List[str]:
+        """Up to `limit` question ids in id order, starting after `after` (then skipping
+        `offset`), optionally restricted to a subject and/or year"""
+        clauses, params = self._where(subject, year)
+        if after is not None:
+            clauses.append("id > ?")
+            params.append(after)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id FROM questions {where}ORDER BY id LIMIT ? OFFSET ?", (*params, limit, offset)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_matching(self, subject: Optional[str] = None, year: Optional[int] = None) -> int:
+        """Number of questions with the given subject and/or year"""
+        if year is None:
+            return self.total if subject is None else self._counts["subject"].get(subject, 0)
+        if subject is None:
+            return self._counts["year"].get(str(year), 0)
+        clauses, params = self._where(subject, year)
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM questions WHERE {' AND '.join(clauses)}", params).fetchone()[0]
+
+    def rebuild(self, collection, page_size: int = 1000) -> int:
+        """Recount from collection metadata, one page at a time; returns the total"""
+        self.clear()
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return self.total
+            self.add(page["ids"], None, page["metadatas"])
+            offset += len(page["ids"])
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Rebuild the subject/year/paper-type counters from the collection (with the API stopped)"
+    )
+    parser.add_argument("--chroma-path", default="./chroma_db")
+    parser.add_argument("--data-dir", help="the API's DATA_DIR (default: $DATA_DIR, else --chroma-path)")
+    parser.add_argument("--collection", default="ssc_questions")
+    args = parser.parse_args(argv)
+
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=args.chroma_path).get_collection(args.collection)
+    data_dir = args.data_dir or os.getenv("DATA_DIR") or args.chroma_path
+    counters = AggregateCounters(os.getenv("AGGREGATES_PATH") or os.path.join(data_dir, "aggregates.sqlite3"))
+    total = counters.rebuild(collection)
+    print(f"Counted {total} questions in {len(counters.counts('subject'))} subjects")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive cache key for a query"""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """Bounded LRU cache from normalized query text to embedding vector.
+
+    Vectors are kept as float32 arrays (float16 with QUERY_CACHE_DTYPE=float16, which
+    halves the footprint) and the cache evicts least recently used entries once the
+    stored bytes exceed `max_bytes`. When `path` is set, entries are also
+    written through to a SQLite file so warm queries survive a restart; a memory miss
+    that hits the disk tier promotes the entry back into memory.
+
+    Safe to share between the request threadpool and the embedding worker thread. The
+    disk tier has its own lock, so async callers can check memory on the event loop
+    (get/put with disk=False) while get_disk/put_disk run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        path: Optional[str] = None,
+        namespace: str = "default",
+        dtype: Optional[str] = None,
+    ):
+        if max_bytes is None:
+            max_bytes = int(os.getenv("QUERY_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        if path is None:
+            path = os.getenv("QUERY_CACHE_PATH") or None
+
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype or os.getenv("QUERY_CACHE_DTYPE", "float32"))
+        # Disk rows are raw bytes, so other dtypes get their own namespace
+        self.namespace = namespace if self.dtype == np.float32 else f"{namespace}:{self.dtype.name}"
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "namespace TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (namespace, query))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _entry_size(key: str, vector: np.ndarray) -> int:
+        return len(key.encode()) + vector.nbytes
+
+    def _store(self, key: str, vector: np.ndarray) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= self._entry_size(key, previous)
+
+        self._entries[key] = vector
+        self._bytes += self._entry_size(key, vector)
+
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_vector = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(old_key, old_vector)
+            self.evictions += 1
+
+    @property
+    def disk_tier(self) -> bool:
+        return self._db is not None
+
+    def get(self, text: str, disk: bool = True) -> Optional[List[float]]:
+        """Cached embedding of `text`, or None.
+
+        With disk=False only memory is checked and a miss is left uncounted when the
+        disk tier could still serve it; follow it with get_disk().
+        """
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+            if self._db is None:
+                self.misses += 1
+                return None
+        return self.get_disk(text) if disk else None
+
+    def get_disk(self, text: str) -> Optional[List[float]]:
+        """Disk-tier lookup after a memory miss, promoting a hit into memory (blocking)"""
+        key = normalize_query(text)
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE namespace = ? AND query = ?", (self.namespace, key)
+                ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            vector = np.frombuffer(row[0], dtype=self.dtype)
+            self._store(key, vector)
+            self.hits += 1
+            self.disk_hits += 1
+            return vector.tolist()
+
+    def put(self, text: str, embedding: List[float], disk: bool = True) -> None:
+        """Cache an embedding in memory and, unless disk=False, write it through to disk"""
+        key = normalize_query(text)
+        vector = np.asarray(embedding, dtype=self.dtype)
+        with self._lock:
+            self._store(key, vector)
+        if disk:
+            self.put_disk(text, embedding)
+
+    def put_disk(self, text: str, embedding: List[float]) -> None:
+        """Write an embedding to the disk tier, if there is one (blocking)"""
+        if self._db is None:
+            return
+        vector = np.asarray(embedding, dtype=self.dtype)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (namespace, query, vector) VALUES (?, ?, ?)",
+                (self.namespace, normalize_query(text), vector.tobytes()),
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "disk_tier": self._db is not None,
+                "dtype": self.dtype.name,
+            }
+
+
+class SearchResultCache:
+    """TTL + LRU cache of search results, invalidated by a collection version.
+
+    Entries are stored with the collection version current when the search ran. A
+    lookup under a newer version (any insert, update or delete since) treats the entry
+    as stale and drops it, so cached results never outlive a write in this process.
+    The TTL bounds staleness from writes made by other replicas.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 1024))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("SEARCH_CACHE_TTL", 300))
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(question: str, top_k: int, filters: Optional[dict] = None) -> tuple:
+        filter_items = tuple(sorted((k, repr(v)) for k, v in (filters or {}).items() if v is not None))
+        return (normalize_query(question), top_k, filter_items)
+
+    def get(self, key: tuple, version: int) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry_version, expires_at, results = entry
+            if entry_version != version:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, key: tuple, version: int, results: List[dict]) -> None:
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -1,85 +1,505 @@
+import json
+import logging
+import os
+import threading
+import time
 from typing import Dict, List, Optional
 
 import chromadb
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from .aggregates import AggregateCounters
+from .cache import EmbeddingCache, SearchResultCache
+from .embedding_backends import create_embedding_backend
+from .duplicate_index import DuplicateIndex, normalize_question, shingle_jaccard
+from .embedding_store import EmbeddingStore
+from .lexical_index import BM25Index
+from .neighbor_table import Neighbor, NeighborTable
+from .vector_index import NumpyVectorIndex
+
+
+logger = logging.getLogger(__name__)
+
+# Metadata keys that map onto QuestionResponse fields; anything else is passed through
+EDITABLE_FIELDS = ("text", "options", "correct_answer", "subject", "year", "paper_type")
+QUESTION_FIELDS = EDITABLE_FIELDS + ("question_id",)
 
 
 class ChromaClient:
     def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        # Seconds spent in each startup phase, logged and reported by /health/ready
+        self.startup_timings: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        self.model_name = "all-MiniLM-L6-v2"
+        # EMBEDDING_BACKEND: sentence-transformers (default) or onnx (int8 ONNX Runtime, ONNX_MODEL_PATH)
+        self.backend = create_embedding_backend(self.model_name)
+        self._timed("model_load", start)
+
+        start = time.perf_counter()
         # Use persistent client for production
-        self.client = chromadb.PersistentClient(path="./chroma_db")
+        self.persist_path = "./chroma_db"
+        self.client = chromadb.PersistentClient(path=self.persist_path)
         # For development, you can use HttpClient to connect to ChromaDB container
         # self.client = chromadb.HttpClient(host="localhost", port=8001)
 
         self.collection = self.client.get_or_create_collection(
             name="ssc_questions", metadata={"description": "SSC Exam Questions Database"}
         )
+        self._timed("chroma_open", start)
+
+        # Root of every file the API keeps besides Chroma's own; each index's *_PATH
+        # variable still overrides its location (and an empty value disables it)
+        self.data_dir = os.getenv("DATA_DIR") or self.persist_path
+
+        # Texts per model forward pass and questions per collection.add call
+        self.encode_batch_size = int(os.getenv("EMBED_BATCH_SIZE", 64))
+        self.insert_batch_size = int(os.getenv("CHROMA_INSERT_BATCH_SIZE", 100))
+
+        # Filtered searches start at top_k * factor results and double up to the cap
+        self.overfetch_factor = int(os.getenv("SEARCH_OVERFETCH_FACTOR", 2))
+        self.max_fetch = int(os.getenv("SEARCH_MAX_FETCH", 500))
+
+        # Document embeddings persisted by text hash; an empty EMBEDDING_STORE_PATH disables it
+        store_path = os.getenv("EMBEDDING_STORE_PATH", os.path.join(self.data_dir, "embedding_store"))
+        # Keyed by backend name, so vectors from different backends are never mixed
+        self.embedding_store = EmbeddingStore(store_path, self.backend.name) if store_path else None
+
+        # Repeated queries skip the model (QUERY_CACHE_MAX_BYTES, optional QUERY_CACHE_PATH)
+        self.query_cache = EmbeddingCache(namespace=self.backend.name)
+
+        # Every write bumps the version, which invalidates cached search results
+        self.version = 0
+        self._version_lock = threading.Lock()
+        self.result_cache = SearchResultCache()
+
+        # Secondary indexes mirror every write through _index_add/_index_remove; each
+        # listener has add(ids, embeddings, metadatas) and remove(ids)
+        self._index_listeners = []
+
+        # Question counts by subject/year/paper type for /stats and /subjects, recounted
+        # by a paged scan when they disagree with the collection
+        start = time.perf_counter()
+        self.aggregates = AggregateCounters(
+            os.getenv("AGGREGATES_PATH") or os.path.join(self.data_dir, "aggregates.sqlite3")
+        )
+        if len(self.aggregates) != self.collection.count():
+            self._rebuild_index(self.aggregates, include=["metadatas"])
+        self._index_listeners.append(self.aggregates)
+        self._timed("aggregates_load", start)
+
+        # VECTOR_ENGINE=numpy serves searches from an exact in-process index instead of Chroma
+        self.vector_engine = os.getenv("VECTOR_ENGINE", "chroma").lower()
+        self.numpy_index: Optional[NumpyVectorIndex] = None
+        if self.vector_engine == "numpy":
+            start = time.perf_counter()
+            self.numpy_index = NumpyVectorIndex(
+                os.getenv("NUMPY_INDEX_PATH") or os.path.join(self.data_dir, "numpy_index")
+            )
+            if len(self.numpy_index) != self.collection.count():
+                self._rebuild_index(self.numpy_index)
+            self._index_listeners.append(self.numpy_index)
+            self._timed("numpy_index_load", start)
+
+        # BM25 index over question text and options for hybrid/lexical search; an empty
+        # BM25_INDEX_PATH disables it (hybrid requests then fall back to vector search)
+        lexical_path = os.getenv("BM25_INDEX_PATH", os.path.join(self.data_dir, "bm25_index"))
+        self.lexical_index: Optional[BM25Index] = None
+        if lexical_path:
+            start = time.perf_counter()
+            self.lexical_index = BM25Index(lexical_path)
+            if len(self.lexical_index) != self.collection.count():
+                self._rebuild_index(self.lexical_index, include=["metadatas"])
+            self._index_listeners.append(self.lexical_index)
+            self._timed("lexical_index_load", start)
+
+        # Exact and near-verbatim question lookup for the /query fast path (in memory,
+        # snapshotted at DUPLICATE_INDEX_PATH on shutdown and rebuilt from metadata when
+        # the snapshot is missing or stale); DUPLICATE_FAST_PATH=false disables it
+        self.duplicate_index: Optional[DuplicateIndex] = None
+        if os.getenv("DUPLICATE_FAST_PATH", "true").lower() == "true":
+            start = time.perf_counter()
+            self.duplicate_index = DuplicateIndex(
+                float(os.getenv("DUPLICATE_MIN_JACCARD", 0.8)),
+                os.getenv("DUPLICATE_INDEX_PATH", os.path.join(self.data_dir, "duplicate_index")) or None,
+            )
+            if len(self.duplicate_index) != self.collection.count():
+                self._rebuild_index(self.duplicate_index, include=["metadatas"])
+            self._index_listeners.append(self.duplicate_index)
+            self._timed("duplicate_index_load", start)
+
+        # Precomputed "more like this" lists (NEIGHBOR_TABLE_K per question), filled after
+        # ingest and on first lookup; an empty NEIGHBOR_TABLE_PATH disables the table
+        neighbor_path = os.getenv("NEIGHBOR_TABLE_PATH", os.path.join(self.data_dir, "neighbors.sqlite3"))
+        self.neighbor_table: Optional[NeighborTable] = None
+        if neighbor_path:
+            self.neighbor_table = NeighborTable(neighbor_path, int(os.getenv("NEIGHBOR_TABLE_K", 20)))
+            self._index_listeners.append(self.neighbor_table)
+
+        # Reciprocal rank fusion constant and the candidates taken from each list per result
+        self.rrf_k = int(os.getenv("HYBRID_RRF_K", 60))
+        self.hybrid_fetch_factor = int(os.getenv("HYBRID_FETCH_FACTOR", 4))
+
+    def _timed(self, phase: str, start: float) -> None:
+        self.startup_timings[phase] = round(time.perf_counter() - start, 3)
+        logger.info(f"Startup phase {phase} took {self.startup_timings[phase]:.3f}s")
+
+    def _bump_version(self) -> None:
+        with self._version_lock:
+            self.version += 1
+
+    def _index_add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict]) -> None:
+        for listener in self._index_listeners:
+            try:
+                listener.add(ids, embeddings, metadatas)
+            except Exception as e:
+                # The collection write already succeeded; the index is resynced on the next start
+                logger.warning(f"Index update failed for {type(listener).__name__}: {e}")
+
+    def _index_remove(self, ids: List[str]) -> None:
+        for listener in self._index_listeners:
+            try:
+                listener.remove(ids)
+            except Exception as e:
+                logger.warning(f"Index removal failed for {type(listener).__name__}: {e}")
+
+    def iter_collection(self, include: List[str], page_size: int = 1000):
+        """Yield collection.get pages (dicts of ids plus `include` fields) over the whole collection"""
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+
+    def _rebuild_index(self, index, include: Optional[List[str]] = None) -> None:
+        """Reload a secondary index from the collection (it has drifted or is new)"""
+        logger.info(f"Rebuilding {type(index).__name__} from the collection")
+        index.clear()
+        for page in self.iter_collection(include or ["embeddings", "metadatas"]):
+            index.add(page["ids"], page.get("embeddings"), page["metadatas"])
+        if hasattr(index, "close"):
+            index.close()
+
+    def close(self) -> None:
+        """Flush secondary indexes that buffer writes or snapshot on shutdown"""
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+        if self.duplicate_index is not None:
+            self.duplicate_index.close()
+
+    @staticmethod
+    def _metadata_extras(extras: Optional[Dict]) -> Dict:
+        """Caller-supplied metadata (e.g. the ingest source) stored next to the question
+        fields; keys must not clash with them and values must be scalars"""
+        kept = {}
+        for key, value in (extras or {}).items():
+            if key in QUESTION_FIELDS:
+                raise ValueError(f"metadata key {key!r} is reserved")
+            if value is None:
+                continue
+            if not isinstance(value, (str, int, float, bool)):
+                raise ValueError(f"metadata value for {key!r} must be a string, number or boolean")
+            kept[key] = value
+        return kept
+
+    @staticmethod
+    def _build_metadata(question_data: Dict) -> Dict:
+        """Build the Chroma metadata record for a question.
+
+        Chroma only accepts scalar metadata values, so options are stored as a JSON string.
+        Entries of question_data["metadata"] are stored alongside (see _metadata_extras).
+        """
+        return {
+            **ChromaClient._metadata_extras(question_data.get("metadata")),
+            "text": question_data["text"],
+            "options": json.dumps(question_data.get("options") or []),
+            "correct_answer": question_data.get("correct_answer") or "",
+            "subject": question_data.get("subject") or "General",
+            "year": question_data.get("year") or 2024,
+            "paper_type": question_data.get("paper_type") or "CGL",
+            "question_id": question_data["id"],
+        }
+
+    @staticmethod
+    def _decode_options(value) -> List[str]:
+        """Read options back from metadata (JSON string, or a list from older records)"""
+        if isinstance(value, list):
+            return value
+        if not value:
+            return []
+        try:
+            options = json.loads(value)
+        except (TypeError, ValueError):
+            return [value]
+        return options if isinstance(options, list) else [str(options)]
+
+    def encode_texts(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Encode texts in batches, returning embeddings in input order.
+
+        Texts are sorted by (whitespace) token length first so each batch holds similarly
+        sized inputs and the model spends less work on padding.
+        """
+        if not texts:
+            return []
+
+        batch_size = batch_size or self.encode_batch_size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i].split()))
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+        for start in range(0, len(order), batch_size):
+            indices = order[start : start + batch_size]
+            vectors = self.backend.encode([texts[i] for i in indices], batch_size=batch_size)
+            for i, vector in zip(indices, vectors):
+                embeddings[i] = vector.tolist()
+
+        return embeddings
+
+    def embed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Embed question documents, reusing vectors from the persistent embedding store.
+
+        Only texts the store has never seen go through the model; their vectors are
+        appended to the store for the next ingest, re-index or replica.
+        """
+        if self.embedding_store is None:
+            return self.encode_texts(texts, batch_size)
+
+        stored = self.embedding_store.get_many(texts)
+        embeddings = [vector.astype("float32").tolist() if vector is not None else None for vector in stored]
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = self.encode_texts(missing_texts, batch_size)
+            self.embedding_store.put_many(missing_texts, encoded)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+
+        return embeddings
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, going through the query embedding cache"""
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            embedding = self.encode_texts([query])[0]
+            self.query_cache.put(query, embedding)
+        return embedding
 
     def insert_question(self, question_data: Dict, namespace: str = "ssc-questions"):
         """Insert a single question into ChromaDB"""
-        embedding = self.model.encode([question_data["full_text"]]).tolist()[0]
+        embedding = self.embed_documents([question_data["full_text"]])[0]
 
         self.collection.add(
             documents=[question_data["full_text"]],
             embeddings=[embedding],
-            metadatas=[
-                {
-                    "text": question_data["text"],
-                    "options": question_data.get("options", []),
-                    "correct_answer": question_data.get("correct_answer", ""),
-                    "subject": question_data.get("subject", "General"),
-                    "year": question_data.get("year", 2024),
-                    "paper_type": question_data.get("paper_type", "CGL"),
-                    "question_id": question_data["id"],
-                }
-            ],
+            metadatas=[self._build_metadata(question_data)],
             ids=[question_data["id"]],
         )
+        self._index_add([question_data["id"]], [embedding], [self._build_metadata(question_data)])
+        self._bump_version()
 
-    def batch_insert_questions(self, questions: List[Dict], namespace: str = "ssc-questions"):
-        """Batch insert multiple questions into ChromaDB"""
+    def batch_insert_questions(
+        self, questions: List[Dict], namespace: str = "ssc-questions", batch_size: Optional[int] = None
+    ) -> Dict:
+        """Batch insert multiple questions into ChromaDB.
+
+        All texts are encoded in length-sorted batches and each chunk of questions is
+        written with a single collection.add. If a chunk is rejected, its questions are
+        retried one by one so a single bad record does not fail its neighbours.
+
+        Returns:
+            Dict: {"inserted": int, "failed": [{"index", "id", "error"}, ...]}
+        """
+        failed: List[Dict] = []
         if not questions:
-            return
+            return {"inserted": 0, "failed": failed}
 
+        positions = []
         documents = []
-        embeddings = []
         metadatas = []
         ids = []
 
-        for question in questions:
-            documents.append(question["full_text"])
-            embeddings.append(self.model.encode([question["full_text"]]).tolist()[0])
-            metadatas.append(
-                {
-                    "text": question["text"],
-                    "options": question.get("options", []),
-                    "correct_answer": question.get("correct_answer", ""),
-                    "subject": question.get("subject", "General"),
-                    "year": question.get("year", 2024),
-                    "paper_type": question.get("paper_type", "CGL"),
-                    "question_id": question["id"],
-                }
-            )
+        for position, question in enumerate(questions):
+            try:
+                metadata = self._build_metadata(question)
+                document = question["full_text"]
+            except (KeyError, TypeError, ValueError) as e:
+                failed.append({"index": position, "id": question.get("id"), "error": f"Invalid question: {e}"})
+                continue
+            positions.append(position)
+            documents.append(document)
+            metadatas.append(metadata)
             ids.append(question["id"])
 
-        # Insert in batches to avoid large payloads
-        batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            end_idx = min(i + batch_size, len(documents))
+        try:
+            embeddings = self.embed_documents(documents, batch_size)
+        except Exception as e:
+            failed.extend({"index": p, "id": i, "error": f"Embedding failed: {e}"} for p, i in zip(positions, ids))
+            return {"inserted": 0, "failed": failed}
 
-            self.collection.add(
-                documents=documents[i:end_idx],
-                embeddings=embeddings[i:end_idx],
-                metadatas=metadatas[i:end_idx],
-                ids=ids[i:end_idx],
+        inserted = 0
+        insert_batch_size = self.insert_batch_size
+        for i in range(0, len(documents), insert_batch_size):
+            end_idx = min(i + insert_batch_size, len(documents))
+
+            try:
+                self.collection.add(
+                    documents=documents[i:end_idx],
+                    embeddings=embeddings[i:end_idx],
+                    metadatas=metadatas[i:end_idx],
+                    ids=ids[i:end_idx],
+                )
+                inserted += end_idx - i
+                self._index_add(ids[i:end_idx], embeddings[i:end_idx], metadatas[i:end_idx])
+            except Exception:
+                # Isolate the offending records instead of dropping the whole chunk
+                for j in range(i, end_idx):
+                    try:
+                        self.collection.add(
+                            documents=[documents[j]], embeddings=[embeddings[j]], metadatas=[metadatas[j]], ids=[ids[j]]
+                        )
+                        inserted += 1
+                        self._index_add([ids[j]], [embeddings[j]], [metadatas[j]])
+                    except Exception as e:
+                        failed.append({"index": positions[j], "id": ids[j], "error": str(e)})
+
+            print(f"Inserted batch {i//insert_batch_size + 1}: {end_idx - i} questions")
+
+        self._bump_version()
+        failed.sort(key=lambda f: f["index"])
+        return {"inserted": inserted, "failed": failed}
+
+    def upsert_questions(self, questions: List[Dict], namespace: str = "ssc-questions") -> Dict:
+        """Incrementally store questions, skipping ones that are already up to date.
+
+        IDs are checked in bulk with collection.get per chunk. Unknown IDs are embedded
+        and inserted, IDs whose document changed are re-embedded and upserted, IDs where
+        only metadata changed are upserted with their stored embedding, and identical
+        records are skipped without touching the model.
+
+        Returns:
+            Dict: {"inserted", "updated", "skipped": int, "failed": [{"index", "id", "error"}]}
+        """
+        counts = {"inserted": 0, "updated": 0, "skipped": 0, "failed": []}
+
+        # Later occurrences of an ID within the batch win
+        records: Dict[str, tuple] = {}
+        for position, question in enumerate(questions):
+            try:
+                record = (position, question["full_text"], self._build_metadata(question))
+            except (KeyError, TypeError, ValueError) as e:
+                counts["failed"].append({"index": position, "id": question.get("id"), "error": f"Invalid question: {e}"})
+                continue
+            if question["id"] in records:
+                counts["skipped"] += 1
+            records[question["id"]] = record
+
+        ids = list(records)
+        for i in range(0, len(ids), self.insert_batch_size):
+            self._upsert_chunk(ids[i : i + self.insert_batch_size], records, counts)
+
+        if counts["inserted"] or counts["updated"]:
+            self._bump_version()
+        counts["failed"].sort(key=lambda f: f["index"])
+        return counts
+
+    def _upsert_chunk(self, ids: List[str], records: Dict[str, tuple], counts: Dict) -> None:
+        existing = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        stored = {
+            id_: (document, metadata)
+            for id_, document, metadata in zip(existing["ids"], existing["documents"], existing["metadatas"])
+        }
+
+        to_embed, reuse_embedding, new_ids = [], [], set()
+        for id_ in ids:
+            _, document, metadata = records[id_]
+            if id_ not in stored:
+                to_embed.append(id_)
+                new_ids.add(id_)
+                continue
+            old_document, old_metadata = stored[id_]
+            if old_document != document:
+                to_embed.append(id_)
+            elif any((old_metadata or {}).get(key) != value for key, value in metadata.items()):
+                reuse_embedding.append(id_)
+            else:
+                counts["skipped"] += 1
+
+        embeddings: Dict[str, List[float]] = {}
+        if reuse_embedding:
+            current = self.collection.get(ids=reuse_embedding, include=["embeddings"])
+            embeddings.update(zip(current["ids"], current["embeddings"]))
+        if to_embed:
+            embeddings.update(zip(to_embed, self.embed_documents([records[id_][1] for id_ in to_embed])))
+
+        write_ids = to_embed + reuse_embedding
+        if not write_ids:
+            return
+
+        def count_written(id_):
+            counts["inserted" if id_ in new_ids else "updated"] += 1
+
+        try:
+            self.collection.upsert(
+                ids=write_ids,
+                documents=[records[id_][1] for id_ in write_ids],
+                metadatas=[records[id_][2] for id_ in write_ids],
+                embeddings=[embeddings[id_] for id_ in write_ids],
             )
+            for id_ in write_ids:
+                count_written(id_)
+            self._index_add(write_ids, [embeddings[id_] for id_ in write_ids], [records[id_][2] for id_ in write_ids])
+        except Exception:
+            for id_ in write_ids:
+                try:
+                    self.collection.upsert(
+                        ids=[id_], documents=[records[id_][1]], metadatas=[records[id_][2]], embeddings=[embeddings[id_]]
+                    )
+                    count_written(id_)
+                    self._index_add([id_], [embeddings[id_]], [records[id_][2]])
+                except Exception as e:
+                    counts["failed"].append({"index": records[id_][0], "id": id_, "error": str(e)})
 
-            print(f"Inserted batch {i//batch_size + 1}: {end_idx - i} questions")
+    @classmethod
+    def _match(cls, id_: str, metadata: Dict, similarity: float, document: Optional[str] = None) -> Dict:
+        return {
+            "question": metadata.get("text", document),
+            "options": cls._decode_options(metadata.get("options")),
+            "correct_answer": metadata.get("correct_answer", ""),
+            "subject": metadata.get("subject", ""),
+            "similarity_score": similarity,
+            "question_id": metadata.get("question_id", id_),
+        }
 
-    def semantic_search(self, query: str, top_k: int = 5, subject: Optional[str] = None):
-        """Semantic search in ChromaDB"""
-        query_embedding = self.model.encode([query]).tolist()[0]
+    def _format_matches(self, results: Dict, row: int = 0) -> List[Dict]:
+        """Convert one row of a collection.query result into match dicts"""
+        matches = []
+        if results["documents"] and results["documents"][row]:
+            for i in range(len(results["documents"][row])):
+                similarity = (
+                    min(1.0, max(0.0, 1 - results["distances"][row][i]))
+                    if "distances" in results and results["distances"][row]
+                    else 0.8
+                )
+                matches.append(
+                    self._match(
+                        results["ids"][row][i], results["metadatas"][row][i], similarity, results["documents"][row][i]
+                    )
+                )
+
+        return matches
+
+    def _format_hits(self, hits: List[Dict]) -> List[Dict]:
+        """Convert NumpyVectorIndex hits into match dicts"""
+        return [self._match(hit["id"], hit["metadata"], hit["similarity"]) for hit in hits]
+
+    def search_by_embedding(self, query_embedding: List[float], top_k: int = 5, subject: Optional[str] = None):
+        """Nearest-neighbour search for an already computed query embedding"""
+        if self.numpy_index is not None:
+            return self._format_hits(
+                self.numpy_index.search(query_embedding, top_k, subjects=[subject] if subject else None)
+            )
 
         if subject:
             results = self.collection.query(
@@ -88,25 +508,281 @@ class ChromaClient:
         else:
             results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k)
 
-        matches = []
-        if results["documents"] and results["documents"][0]:
-            for i in range(len(results["documents"][0])):
-                matches.append(
-                    {
-                        "question": results["metadatas"][0][i].get("text", results["documents"][0][i]),
-                        "options": results["metadatas"][0][i].get("options", []),
-                        "correct_answer": results["metadatas"][0][i].get("correct_answer", ""),
-                        "subject": results["metadatas"][0][i].get("subject", ""),
-                        "similarity_score": (
-                            1 - results["distances"][0][i]
-                            if "distances" in results and results["distances"][0]
-                            else 0.8
-                        ),
-                        "question_id": results["metadatas"][0][i].get("question_id", results["ids"][0][i]),
-                    }
+        return self._format_matches(results)
+
+    @staticmethod
+    def _build_where(
+        subjects: Optional[List[str]] = None,
+        years: Optional[List[int]] = None,
+        paper_types: Optional[List[str]] = None,
+    ) -> Optional[Dict]:
+        """Translate search filters into a Chroma where clause"""
+        clauses = []
+        for field, values in (("subject", subjects), ("year", years), ("paper_type", paper_types)):
+            if not values:
+                continue
+            values = list(dict.fromkeys(values))
+            clauses.append({field: {"$eq": values[0]}} if len(values) == 1 else {field: {"$in": values}})
+
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def filtered_search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        subjects: Optional[List[str]] = None,
+        years: Optional[List[int]] = None,
+        paper_types: Optional[List[str]] = None,
+        min_similarity: Optional[float] = None,
+    ) -> List[Dict]:
+        """Search with metadata filters applied inside the vector store.
+
+        Filters become a where clause so Chroma only ranks matching questions. Selective
+        filters can leave the ANN search short of top_k, so filtered searches over-fetch
+        and double the request until top_k results pass, the results drop below
+        `min_similarity` (they are ranked, so fetching more cannot help) or the fetch
+        reaches the collection size or `max_fetch`.
+
+        With the numpy engine filters are exact bitmap prefilters, so no over-fetch is needed.
+        """
+        if self.numpy_index is not None:
+            hits = self.numpy_index.search(
+                query_embedding,
+                top_k,
+                subjects=subjects,
+                years=years,
+                paper_types=paper_types,
+                min_similarity=min_similarity,
+            )
+            return self._format_hits(hits)
+
+        where = self._build_where(subjects, years, paper_types)
+        n_results = top_k * self.overfetch_factor if where else top_k
+        collection_size = None
+
+        while True:
+            results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results, where=where)
+            matches = self._format_matches(results)
+
+            if min_similarity is not None:
+                kept = [match for match in matches if match["similarity_score"] >= min_similarity]
+            else:
+                kept = matches
+
+            if len(kept) >= top_k or len(kept) < len(matches) or n_results >= self.max_fetch:
+                break
+            if collection_size is None:
+                collection_size = self.collection.count()
+            if n_results >= collection_size:
+                break
+            n_results = min(n_results * 2, self.max_fetch)
+
+        return kept[:top_k]
+
+    def _similarities(self, ids: List[str], query_embedding: List[float]) -> Dict[str, float]:
+        """Vector similarity of specific questions, from their stored embeddings"""
+        if not ids:
+            return {}
+        stored = self.collection.get(ids=ids, include=["embeddings"])
+        query = np.asarray(query_embedding, dtype=np.float32)
+        distances = ((np.asarray(stored["embeddings"], dtype=np.float32) - query) ** 2).sum(axis=1)
+        # Same scale as search results: 1 - squared L2 distance, clamped to [0, 1]
+        return {id_: float(min(1.0, max(0.0, 1 - d))) for id_, d in zip(stored["ids"], distances)}
+
+    def hybrid_search(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        subjects: Optional[List[str]] = None,
+        years: Optional[List[int]] = None,
+        paper_types: Optional[List[str]] = None,
+        min_similarity: Optional[float] = None,
+        mode: str = "hybrid",
+    ) -> List[Dict]:
+        """BM25 and vector retrieval combined with reciprocal rank fusion.
+
+        Each list contributes 1 / (rrf_k + rank) per question over its top
+        top_k * hybrid_fetch_factor candidates, and questions are ranked by the sum, so
+        exact keyword matches (names, years, act numbers) surface even when their
+        embedding is not the nearest. mode="lexical" ranks by BM25 alone. min_similarity
+        only restricts the vector list. Every match reports its vector similarity;
+        lexical-only matches get it from their stored embedding.
+        """
+        if self.lexical_index is None:
+            return self.filtered_search(query_embedding, top_k, subjects, years, paper_types, min_similarity)
+
+        fetch = top_k * self.hybrid_fetch_factor
+        lexical = self.lexical_index.search(query, fetch, subjects=subjects, years=years, paper_types=paper_types)
+        if mode == "lexical":
+            ranked_lists = [[hit["id"] for hit in lexical[:top_k]]]
+            vector_matches = {}
+        else:
+            vector = self.filtered_search(query_embedding, fetch, subjects, years, paper_types, min_similarity)
+            vector_matches = {match["question_id"]: match for match in vector}
+            ranked_lists = [list(vector_matches), [hit["id"] for hit in lexical]]
+
+        fused: Dict[str, float] = {}
+        for ranked in ranked_lists:
+            for rank, id_ in enumerate(ranked, start=1):
+                fused[id_] = fused.get(id_, 0.0) + 1.0 / (self.rrf_k + rank)
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:top_k]
+
+        lexical_metadata = {hit["id"]: hit["metadata"] for hit in lexical}
+        similarities = self._similarities([id_ for id_ in top_ids if id_ not in vector_matches], query_embedding)
+        return [
+            vector_matches.get(id_) or self._match(id_, lexical_metadata[id_], similarities.get(id_, 0.0))
+            for id_ in top_ids
+        ]
+
+    def find_duplicates(self, question: str, top_k: int = 5, subject: Optional[str] = None) -> List[Dict]:
+        """Stored questions that are the same as `question`, as matches with similarity 1.0.
+
+        Exact matches of the normalized text come first, then near-verbatim ones (typos,
+        a dropped word) whose shingle Jaccard similarity with the stored text reaches
+        the index's min_jaccard. No embedding is computed.
+        """
+        if self.duplicate_index is None:
+            return []
+        candidates = dict(self.duplicate_index.find(question, top_k * 2, subject))
+        if not candidates:
+            return []
+
+        stored = self.collection.get(ids=list(candidates), include=["metadatas"])
+        normalized = normalize_question(question)
+        found = []
+        for id_, metadata in zip(stored["ids"], stored["metadatas"]):
+            if candidates[id_] < 1.0:
+                similarity = shingle_jaccard(normalized, normalize_question(metadata.get("text", "")))
+                if similarity < self.duplicate_index.min_jaccard:
+                    continue
+                candidates[id_] = min(similarity, 0.999)
+            found.append((id_, metadata))
+
+        found.sort(key=lambda item: -candidates[item[0]])
+        return [self._match(id_, metadata, 1.0) for id_, metadata in found[:top_k]]
+
+    def _stored_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        stored = self.collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(stored["ids"], stored["embeddings"]))
+
+    def _nearest(self, embeddings: List[List[float]], n: int) -> List[List[Neighbor]]:
+        """Unfiltered n nearest questions per embedding, as (id, similarity, subject)"""
+        if self.numpy_index is not None:
+            hit_lists = self.numpy_index.search_many(embeddings, n)
+            return [[(h["id"], h["similarity"], h["metadata"].get("subject", "")) for h in hits] for hits in hit_lists]
+
+        response = self.collection.query(
+            query_embeddings=embeddings,
+            n_results=max(1, min(n, self.collection.count())),
+            include=["metadatas", "distances"],
+        )
+        return [
+            [
+                (id_, min(1.0, max(0.0, 1 - distance)), (metadata or {}).get("subject", ""))
+                for id_, distance, metadata in zip(ids, distances, metadatas)
+            ]
+            for ids, distances, metadatas in zip(response["ids"], response["distances"], response["metadatas"])
+        ]
+
+    def refresh_neighbors(self) -> int:
+        """Compute neighbour lists for questions written since the last refresh"""
+        if self.neighbor_table is None:
+            return 0
+        return self.neighbor_table.refresh(self._nearest, self._stored_embeddings)
+
+    def similar_questions(self, question_id: str, top_k: int = 5, subject: Optional[str] = None):
+        """Questions most similar to a stored question, without encoding anything.
+
+        Returns (source metadata, matches), or None if the question does not exist. With
+        the neighbour table this is a lookup of its stored list (computed from the stored
+        embedding on the first request); otherwise, or when the list has too few live
+        matches for the subject filter, the stored embedding is searched directly. The
+        source question is never part of the matches.
+        """
+        source = self.collection.get(ids=[question_id], include=["metadatas"])
+        if not source["ids"]:
+            return None
+        source_metadata = source["metadatas"][0]
+
+        embedding = None
+        if self.neighbor_table is not None:
+            neighbors = self.neighbor_table.get(question_id)
+            if neighbors is None:
+                embedding = self._stored_embeddings([question_id])[question_id]
+                neighbors = [n for n in self._nearest([embedding], self.neighbor_table.k + 1)[0] if n[0] != question_id]
+                self.neighbor_table.put(question_id, neighbors)
+
+            candidates = [n for n in neighbors if not subject or n[2] == subject][:top_k]
+            if candidates:
+                stored = self.collection.get(ids=[n[0] for n in candidates], include=["metadatas"])
+                metadata_by_id = dict(zip(stored["ids"], stored["metadatas"]))
+                matches = [
+                    self._match(id_, metadata_by_id[id_], similarity)
+                    for id_, similarity, _ in candidates
+                    if id_ in metadata_by_id
+                ]
+            else:
+                matches = []
+            # A short list is complete when it holds every other question
+            if len(matches) == top_k or (len(neighbors) < self.neighbor_table.k and len(matches) == len(candidates)):
+                return source_metadata, matches
+
+        if embedding is None:
+            embedding = self._stored_embeddings([question_id])[question_id]
+        matches = self.filtered_search(embedding, top_k + 1, subjects=[subject] if subject else None)
+        return source_metadata, [match for match in matches if match["question_id"] != question_id][:top_k]
+
+    def semantic_search(self, query: str, top_k: int = 5, subject: Optional[str] = None):
+        """Semantic search in ChromaDB"""
+        query_embedding = self.embed_query(query)
+        return self.search_by_embedding(query_embedding, top_k, subject)
+
+    def batch_semantic_search(self, queries: List[Dict]) -> List[List[Dict]]:
+        """Run several searches with one encode call and one collection.query per subject.
+
+        Each query is a dict with "question", "top_k" and an optional "subject". Queries
+        sharing a subject filter are sent to Chroma together as a multi-embedding query.
+        Results come back in input order.
+        """
+        if not queries:
+            return []
+
+        embeddings = [self.query_cache.get(query["question"]) for query in queries]
+        missing = list(dict.fromkeys(q["question"] for q, e in zip(queries, embeddings) if e is None))
+        if missing:
+            encoded = dict(zip(missing, self.encode_texts(missing)))
+            for text, embedding in encoded.items():
+                self.query_cache.put(text, embedding)
+            embeddings = [e if e is not None else encoded[q["question"]] for q, e in zip(queries, embeddings)]
+
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, query in enumerate(queries):
+            groups.setdefault(query.get("subject") or None, []).append(i)
+
+        results: List[List[Dict]] = [[] for _ in queries]
+        for subject, indices in groups.items():
+            if self.numpy_index is not None:
+                hit_lists = self.numpy_index.search_many(
+                    [embeddings[i] for i in indices],
+                    max(queries[i]["top_k"] for i in indices),
+                    subjects=[subject] if subject else None,
                 )
+                for i, hits in zip(indices, hit_lists):
+                    results[i] = self._format_hits(hits)[: queries[i]["top_k"]]
+                continue
 
-        return matches
+            response = self.collection.query(
+                query_embeddings=[embeddings[i] for i in indices],
+                n_results=max(queries[i]["top_k"] for i in indices),
+                where={"subject": {"$eq": subject}} if subject else None,
+            )
+            for row, i in enumerate(indices):
+                results[i] = self._format_matches(response, row)[: queries[i]["top_k"]]
+
+        return results
 
     def search_by_subject(self, query: str, subject: str, top_k: int = 5):
         """Search within specific subject"""
@@ -116,12 +792,278 @@ class ChromaClient:
         """Get statistics about the collection"""
         return self.collection.count()
 
+    def _question_record(self, question_id: str, metadata: Dict) -> Dict:
+        """A stored question in QuestionResponse shape"""
+        return {
+            "id": question_id,
+            "text": metadata.get("text", ""),
+            "options": self._decode_options(metadata.get("options")),
+            "correct_answer": metadata.get("correct_answer") or None,
+            "subject": metadata.get("subject", ""),
+            "year": metadata.get("year"),
+            "paper_type": metadata.get("paper_type"),
+            "metadata": {key: value for key, value in metadata.items() if key not in QUESTION_FIELDS},
+        }
+
+    def list_questions(
+        self,
+        limit: int,
+        after: Optional[str] = None,
+        offset: int = 0,
+        subject: Optional[str] = None,
+        year: Optional[int] = None,
+        include_embeddings: bool = False,
+    ):
+        """One page of stored questions in id order.
+
+        Ids come from the aggregates keyset index, so a page costs one indexed SQLite
+        range scan plus one collection.get by id, however deep into the collection it
+        is. Returns (records, last_id, has_more); last_id is the cursor for the next
+        page (questions deleted since the index was written are skipped, not counted).
+        """
+        ids = self.aggregates.page_ids(limit + 1, after, offset, subject, year)
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+        if not ids:
+            return [], None, False
+
+        include = ["metadatas", "embeddings"] if include_embeddings else ["metadatas"]
+        page = self.collection.get(ids=ids, include=include)
+        embeddings = page.get("embeddings") if include_embeddings else None
+        stored = {}
+        for row, (id_, metadata) in enumerate(zip(page["ids"], page["metadatas"])):
+            record = self._question_record(id_, metadata or {})
+            if embeddings is not None:
+                record["embedding"] = [float(value) for value in embeddings[row]]
+            stored[id_] = record
+        return [stored[id_] for id_ in ids if id_ in stored], ids[-1], has_more
+
+    def iter_questions(
+        self,
+        page_size: int = 1000,
+        subject: Optional[str] = None,
+        year: Optional[int] = None,
+        include_embeddings: bool = False,
+    ):
+        """Yield stored questions in id order, reading one page at a time"""
+        after = None
+        while True:
+            records, after, has_more = self.list_questions(page_size, after, 0, subject, year, include_embeddings)
+            yield from records
+            if not has_more:
+                return
+
     def delete_question(self, question_id: str):
         """Delete a question by ID"""
         self.collection.delete(ids=[question_id])
+        self._index_remove([question_id])
+        self._bump_version()
+
+    def merge_questions(self, canonical_id: str, duplicate_ids: List[str]) -> None:
+        """Fold duplicates into a canonical question: their ids (and any ids they had
+        absorbed) are recorded in the canonical's `merged_ids`, then they are deleted"""
+        canonical = self.collection.get(ids=[canonical_id], include=["embeddings", "metadatas"])
+        if not canonical["ids"]:
+            raise ValueError(f"Question {canonical_id} not found")
+        metadata = dict(canonical["metadatas"][0])
+
+        merged = set(json.loads(metadata.get("merged_ids") or "[]")) | set(duplicate_ids)
+        for duplicate in self.collection.get(ids=duplicate_ids, include=["metadatas"])["metadatas"]:
+            merged |= set(json.loads(duplicate.get("merged_ids") or "[]"))
+        metadata["merged_ids"] = json.dumps(sorted(merged - {canonical_id}))
+
+        self.collection.update(ids=[canonical_id], metadatas=[metadata])
+        self._index_add([canonical_id], canonical["embeddings"], [metadata])
+        self.collection.delete(ids=duplicate_ids)
+        self._index_remove(duplicate_ids)
+        self._bump_version()
+
+    def get_question(self, question_id: str) -> Optional[Dict]:
+        """A stored question in QuestionResponse shape, or None"""
+        stored = self.collection.get(ids=[question_id], include=["metadatas"])
+        if not stored["ids"]:
+            return None
+        return self._question_record(question_id, stored["metadatas"][0] or {})
+
+    def update_question(self, question_id: str, question_data: Dict) -> Dict:
+        """Replace a stored question with `question_data` (see update_questions), inserting
+        it if it does not exist yet"""
+        result = self.update_questions({question_id: question_data}, replace=True)
+        if question_id in result["not_found"]:
+            return self.upsert_questions([{**question_data, "id": question_id}])
+        return result
+
+    @staticmethod
+    def _apply_update(question: Dict, changes: Dict, replace: bool = False) -> Dict:
+        """The metadata record of `question` after `changes`.
+
+        With `replace` the record is built from `changes` alone; otherwise omitted fields
+        keep their stored values and `changes["metadata"]` is merged into the stored
+        extras, a None value removing the key.
+        """
+        if replace:
+            merged = {**changes, "id": question["id"]}
+        else:
+            merged = {**question, **{key: changes[key] for key in EDITABLE_FIELDS if key in changes}}
+            merged["metadata"] = {**question["metadata"], **(changes.get("metadata") or {})}
+        if not merged.get("text"):
+            raise ValueError("text cannot be empty")
+        return ChromaClient._build_metadata(merged)
+
+    def update_questions(self, updates: Dict[str, Dict], replace: bool = False) -> Dict:
+        """Apply field changes to stored questions with chunked native writes.
+
+        `updates` maps question ids to the QuestionUpdate fields to change; omitted
+        fields keep their stored values and `metadata` entries are merged into the
+        stored extras (None removes a key). With `replace` each entry is a complete
+        question and the stored record is rebuilt from it alone, dropping extras and
+        fields it does not set.
+
+        Each chunk of ids is read with one collection.get and every changed record is
+        written with one collection.upsert. Questions whose text and options are
+        unchanged are written with their stored embedding, so answer key corrections
+        never touch the model; the rest are re-embedded first.
+
+        Returns:
+            Dict: {"updated", "reembedded", "unchanged": int, "not_found": [ids],
+            "failed": [{"id", "error"}]}
+        """
+        counts = {"updated": 0, "reembedded": 0, "unchanged": 0, "not_found": [], "failed": []}
+        ids = list(updates)
+        for i in range(0, len(ids), self.insert_batch_size):
+            self._update_chunk(ids[i : i + self.insert_batch_size], updates, replace, counts)
+
+        if counts["updated"]:
+            self._bump_version()
+        return counts
+
+    def _update_chunk(self, ids: List[str], updates: Dict[str, Dict], replace: bool, counts: Dict) -> None:
+        existing = self.collection.get(ids=ids, include=["metadatas"])
+        found = set(existing["ids"])
+        counts["not_found"] += [id_ for id_ in ids if id_ not in found]
+
+        metadata_only, reembed, dropping_keys = [], [], set()
+        metadatas, embeddings, documents = {}, {}, {}
+        for id_, metadata in zip(existing["ids"], existing["metadatas"]):
+            metadata = metadata or {}
+            question = self._question_record(id_, metadata)
+            try:
+                updated = self._apply_update(question, updates[id_], replace)
+            except (KeyError, TypeError, ValueError) as e:
+                counts["failed"].append({"id": id_, "error": f"Invalid update: {e}"})
+                continue
+
+            options = self._decode_options(updated["options"])
+            if updated["text"] != question["text"] or options != question["options"]:
+                reembed.append(id_)
+            elif updated != metadata:
+                metadata_only.append(id_)
+            else:
+                counts["unchanged"] += 1
+                continue
+            if metadata.keys() - updated.keys():
+                dropping_keys.add(id_)
+            metadatas[id_] = updated
+            documents[id_] = f"{updated['text']} Options: {', '.join(options)}"
+
+        # Stored vectors are read only for ids known to exist (the secondary indexes
+        # need them); a get of only unknown ids would return every embedding
+        if metadata_only:
+            embeddings.update(self._stored_embeddings(metadata_only))
+        if reembed:
+            try:
+                embeddings.update(zip(reembed, self.embed_documents([documents[id_] for id_ in reembed])))
+            except Exception as e:
+                counts["failed"] += [{"id": id_, "error": f"Embedding failed: {e}"} for id_ in reembed]
+                reembed = []
+
+        def write(chunk: List[str]) -> None:
+            # Chroma merges metadata on update and upsert, so records losing a key are
+            # deleted first and the upsert writes them afresh; if the upsert fails they
+            # are put back as they were, so the collection never loses a question the
+            # secondary indexes still list
+            dropped = [id_ for id_ in chunk if id_ in dropping_keys]
+            snapshot = None
+            if dropped:
+                snapshot = self.collection.get(ids=dropped, include=["embeddings", "documents", "metadatas"])
+                self.collection.delete(ids=dropped)
+            try:
+                self.collection.upsert(
+                    ids=chunk,
+                    documents=[documents[id_] for id_ in chunk],
+                    metadatas=[metadatas[id_] for id_ in chunk],
+                    embeddings=[embeddings[id_] for id_ in chunk],
+                )
+            except Exception:
+                if snapshot is not None:
+                    self._restore_records(snapshot, dropped)
+                raise
+
+        written = self._write_chunk(metadata_only + reembed, write, embeddings, metadatas, counts)
+        counts["updated"] += len(written)
+        counts["reembedded"] += len(set(written) & set(reembed))
+
+    def _restore_records(self, snapshot: Dict, ids: List[str]) -> None:
+        """Re-add the records of a collection.get snapshot (with embeddings, documents
+        and metadatas) that are among `ids`"""
+        wanted = set(ids)
+        # A get of only unknown ids returns every record, so keep just the requested ones
+        rows = [i for i, id_ in enumerate(snapshot["ids"]) if id_ in wanted]
+        if rows:
+            self.collection.add(
+                ids=[snapshot["ids"][i] for i in rows],
+                embeddings=[snapshot["embeddings"][i] for i in rows],
+                documents=[snapshot["documents"][i] for i in rows],
+                metadatas=[snapshot["metadatas"][i] for i in rows],
+            )
+
+    def _write_chunk(self, ids: List[str], write, embeddings: Dict, metadatas: Dict, counts: Dict) -> List[str]:
+        """Run write(ids) once for the chunk, falling back to one id at a time if it is
+        rejected; mirrors the written ids into the secondary indexes and returns them"""
+        if not ids:
+            return []
+        try:
+            write(ids)
+            written = ids
+        except Exception:
+            written = []
+            for id_ in ids:
+                try:
+                    write([id_])
+                    written.append(id_)
+                except Exception as e:
+                    counts["failed"].append({"id": id_, "error": str(e)})
+        if written:
+            self._index_add(written, [embeddings[id_] for id_ in written], [metadatas[id_] for id_ in written])
+        return written
+
+    def source_question_ids(self, source: str, page_size: int = 1000) -> List[str]:
+        """Ids of the stored questions ingested from `source`, read page by page"""
+        ids: List[str] = []
+        while True:
+            page = self.collection.get(where={"source": source}, include=[], limit=page_size, offset=len(ids))
+            if not page["ids"]:
+                return ids
+            ids += page["ids"]
+
+    def delete_questions(self, question_ids: List[str]) -> Dict:
+        """Delete questions in chunks, one collection.delete per chunk.
+
+        Returns:
+            Dict: {"deleted": int, "not_found": [ids]}
+        """
+        result = {"deleted": 0, "not_found": []}
+        ids = list(dict.fromkeys(question_ids))
+        for i in range(0, len(ids), self.insert_batch_size):
+            chunk = ids[i : i + self.insert_batch_size]
+            found = set(self.collection.get(ids=chunk, include=[])["ids"])
+            result["not_found"] += [id_ for id_ in chunk if id_ not in found]
+            chunk = [id_ for id_ in chunk if id_ in found]
+            if chunk:
+                self.collection.delete(ids=chunk)
+                self._index_remove(chunk)
+                result["deleted"] += len(chunk)
 
-    def update_question(self, question_id: str, question_data: Dict):
-        """Update a question"""
-        # Delete old and insert new
-        self.delete_question(question_id)
-        self.insert_question(question_data)
+        if result["deleted"]:
+            self._bump_version()
+        return result
@@ -0,0 +1,262 @@
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .duplicate_index import NUMBER_PATTERN, normalize_question
+
+# Rows and columns per similarity tile; a float32 tile is block_rows * block_cols * 4 bytes
+DEDUPE_BLOCK_ROWS = int(os.getenv("DEDUPE_BLOCK_ROWS", 2048))
+DEDUPE_BLOCK_COLS = int(os.getenv("DEDUPE_BLOCK_COLS", 8192))
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+def similar_pairs(
+    vectors: np.ndarray,
+    threshold: float,
+    block_rows: int = DEDUPE_BLOCK_ROWS,
+    block_cols: int = DEDUPE_BLOCK_COLS,
+    progress: Optional[Callable[[int, int], None]] = None,
+):
+    """All pairs (i < j) of rows whose similarity is at least `threshold`.
+
+    Rows must be L2-normalized. Similarity is on the search results' scale, 1 minus
+    the squared L2 distance (2 * cosine - 1), so `threshold` reads like a
+    similarity_score. Only the upper triangle is computed, one block_rows x block_cols
+    tile at a time, so memory stays bounded whatever the corpus size. `progress` is
+    called with (tiles done, total tiles).
+
+    Returns (left, right, similarity) arrays.
+    """
+    n = len(vectors)
+    cosine_threshold = np.float32((threshold + 1) / 2)
+    tiles = [(row, col) for row in range(0, n, block_rows) for col in range(row, n, block_cols)]
+
+    lefts, rights, scores = [], [], []
+    for done, (row, col) in enumerate(tiles, start=1):
+        rows = vectors[row : row + block_rows]
+        tile = rows @ vectors[col : col + block_cols].T
+        i, j = np.nonzero(tile >= cosine_threshold)
+        i, j = i + row, j + col
+        upper = i < j
+        lefts.append(i[upper])
+        rights.append(j[upper])
+        scores.append(2 * tile[i[upper] - row, j[upper] - col] - 1)
+        if progress:
+            progress(done, len(tiles))
+
+    if not lefts:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32)
+    return np.concatenate(lefts), np.concatenate(rights), np.concatenate(scores)
+
+
+def canonical_key(metadata: Dict):
+    """Sort key choosing the question a cluster keeps: earliest year, then one with an
+    answer key, then the most options, then the smallest id"""
+    options = metadata.get("options") or "[]"
+    try:
+        option_count = len(json.loads(options)) if isinstance(options, str) else len(options)
+    except ValueError:
+        option_count = 0
+    return (
+        metadata.get("year") or 9999,
+        not metadata.get("correct_answer"),
+        -option_count,
+        metadata.get("question_id", ""),
+    )
+
+
+def question_numbers(metadata: Dict) -> List[str]:
+    """Number tokens of a question's text ("a train 150 m long" and "200 m long" differ)"""
+    return NUMBER_PATTERN.findall(normalize_question(metadata.get("text", "")))
+
+
+def load_embeddings(chroma_client, report: Callable[[Dict], None]):
+    """Read (ids, normalized float32 vectors, metadatas) from the collection page by page"""
+    total = chroma_client.collection.count()
+    report({"phase": "loading", "questions_total": total, "questions_scanned": 0, "progress": 0.0})
+
+    # Preallocated from the count at the start; questions written during the scan are
+    # left for the next run
+    ids: List[str] = []
+    metadatas: List[Dict] = []
+    vectors: Optional[np.ndarray] = None
+    for page in chroma_client.iter_collection(["embeddings", "metadatas"]):
+        page_vectors = np.asarray(page["embeddings"], dtype=np.float32)[: total - len(ids)]
+        if vectors is None:
+            vectors = np.empty((total, page_vectors.shape[1]), dtype=np.float32)
+        vectors[len(ids) : len(ids) + len(page_vectors)] = page_vectors
+        ids += page["ids"][: len(page_vectors)]
+        metadatas += page["metadatas"][: len(page_vectors)]
+        report({"questions_scanned": len(ids), "progress": 0.1 * len(ids) / total})
+        if len(ids) == total:
+            break
+    if vectors is None:
+        return [], np.zeros((0, 0), dtype=np.float32), []
+
+    vectors = vectors[: len(ids)]
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return ids, vectors, metadatas
+
+
+def find_duplicate_clusters(
+    chroma_client,
+    threshold: float = 0.9,
+    same_subject: bool = True,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> List[Dict]:
+    """Group the collection's near-duplicate questions (see cluster_duplicates).
+
+    `progress` receives job fields as the scan advances.
+    """
+    report = progress or (lambda fields: None)
+    ids, vectors, metadatas = load_embeddings(chroma_client, report)
+    return cluster_duplicates(ids, vectors, metadatas, threshold, same_subject, report)
+
+
+def cluster_duplicates(
+    ids: List[str],
+    vectors: np.ndarray,
+    metadatas: List[Dict],
+    threshold: float = 0.9,
+    same_subject: bool = True,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> List[Dict]:
+    """Cluster near-duplicate questions from their normalized embeddings.
+
+    Vectors are compared with similar_pairs (per subject when `same_subject`, which
+    also cuts the work) and pairs are linked with union-find, so chains of close edits
+    form one cluster. Each cluster is {"canonical_id", "question_ids", "held_ids",
+    "subject", "text", "max_similarity", "min_similarity"}, largest first; min/max are
+    over the linking pairs.
+
+    Chaining can link questions that are not close to the canonical one, and numeric
+    variants ("150 m" vs "200 m") embed almost identically, so members below
+    `threshold` against the canonical question or with different numbers in the text
+    are listed in `held_ids`: reported, but never merged.
+    """
+    report = progress or (lambda fields: None)
+
+    groups: Dict[str, List[int]] = {}
+    for row, metadata in enumerate(metadatas):
+        groups.setdefault(metadata.get("subject", "") if same_subject else "", []).append(row)
+
+    # Tiles scale with the square of the group size, so progress is weighted the same way
+    work_total = sum(len(rows) ** 2 for rows in groups.values()) or 1
+    work_done = 0
+    start = time.perf_counter()
+    report({"phase": "comparing"})
+
+    union_find = UnionFind(len(ids))
+    pair_scores: Dict[int, List[float]] = {}
+    pairs_found = 0
+    for rows in groups.values():
+        rows = np.asarray(rows)
+        weight = len(rows) ** 2
+
+        def tile_progress(done, tiles):
+            report(
+                {
+                    "pairs_found": pairs_found,
+                    "progress": 0.1 + 0.85 * (work_done + weight * done / tiles) / work_total,
+                    "elapsed_seconds": round(time.perf_counter() - start, 1),
+                }
+            )
+
+        # A single group is the whole matrix, which is used without a copy
+        group_vectors = vectors if len(groups) == 1 else vectors[rows]
+        left, right, scores = similar_pairs(group_vectors, threshold, progress=tile_progress)
+        left, right = rows[left], rows[right]
+        for a, b, score in zip(left.tolist(), right.tolist(), scores.tolist()):
+            union_find.union(a, b)
+            pair_scores.setdefault(a, []).append(score)
+            pair_scores.setdefault(b, []).append(score)
+        pairs_found += len(left)
+        work_done += weight
+
+    members: Dict[int, List[int]] = {}
+    for row in pair_scores:
+        members.setdefault(union_find.find(row), []).append(row)
+
+    clusters = []
+    for rows in members.values():
+        rows.sort(key=lambda row: canonical_key(metadatas[row]))
+        scores = [score for row in rows for score in pair_scores[row]]
+        canonical = metadatas[rows[0]]
+        numbers = question_numbers(canonical)
+        to_canonical = 2 * (vectors[rows[1:]] @ vectors[rows[0]]) - 1
+        clusters.append(
+            {
+                "canonical_id": ids[rows[0]],
+                "question_ids": [ids[row] for row in rows],
+                "held_ids": [
+                    ids[row]
+                    for row, similarity in zip(rows[1:], to_canonical.tolist())
+                    # Small slack for float32 rounding of pairs right at the threshold
+                    if similarity < threshold - 1e-6 or question_numbers(metadatas[row]) != numbers
+                ],
+                "subject": canonical.get("subject", ""),
+                "text": canonical.get("text", ""),
+                "max_similarity": round(min(1.0, max(scores)), 4),
+                "min_similarity": round(min(1.0, min(scores)), 4),
+            }
+        )
+    clusters.sort(key=lambda cluster: (-len(cluster["question_ids"]), cluster["canonical_id"]))
+
+    report(
+        {
+            "phase": "clustered",
+            "pairs_found": pairs_found,
+            "clusters_found": len(clusters),
+            "duplicate_questions": sum(len(c["question_ids"]) - 1 for c in clusters),
+            "progress": 0.95,
+            "elapsed_seconds": round(time.perf_counter() - start, 1),
+        }
+    )
+    return clusters
+
+
+def merge_clusters(chroma_client, clusters: List[Dict], progress: Optional[Callable[[Dict], None]] = None) -> int:
+    """Keep each cluster's canonical question and delete the rest, except `held_ids`.
+
+    The canonical question's metadata records the removed ids in `merged_ids` (a JSON
+    list, extended on later merges). Returns the number of questions removed.
+    """
+    report = progress or (lambda fields: None)
+    report({"phase": "merging", "questions_merged": 0})
+
+    merged = 0
+    for done, cluster in enumerate(clusters, start=1):
+        kept = {cluster["canonical_id"], *cluster.get("held_ids", ())}
+        duplicates = [id_ for id_ in cluster["question_ids"] if id_ not in kept]
+        if not duplicates:
+            continue
+        chroma_client.merge_questions(cluster["canonical_id"], duplicates)
+        merged += len(duplicates)
+        report({"questions_merged": merged, "progress": 0.95 + 0.05 * done / len(clusters)})
+    return merged
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# "Q12.", "Q.12", "Question 3)", "7:" in front of a pasted question
+QUESTION_NUMBER_PATTERN = re.compile(r"^\s*(?:q(?:uestion)?\s*(?:no)?\s*[.:]?\s*\d+\s*[.):-]?|\d+\s*[.):])\s*", re.I)
+WORD_PATTERN = re.compile(r"\w+")
+NUMBER_PATTERN = re.compile(r"\d+")
+
+SHINGLE_CHARS = 4
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+# Three standard errors of the 64-permutation Jaccard estimate
+ESTIMATE_SLACK = 0.15
+MINHASH_PRIME = 4294967291  # largest prime below 2**32
+
+_rng = np.random.default_rng(20)
+# Universal hash functions (a * x + b) mod p standing in for random permutations
+_MINHASH_A = _rng.integers(1, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _rng.integers(0, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase words only, without a leading question number, punctuation or extra spaces"""
+    return " ".join(WORD_PATTERN.findall(QUESTION_NUMBER_PATTERN.sub("", text or "").lower()))
+
+
+def shingles(normalized: str) -> Set[str]:
+    if len(normalized) <= SHINGLE_CHARS:
+        return {normalized}
+    return {normalized[i : i + SHINGLE_CHARS] for i in range(len(normalized) - SHINGLE_CHARS + 1)}
+
+
+def shingle_jaccard(a: str, b: str) -> float:
+    """Exact Jaccard similarity of two normalized texts' character shingles"""
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def text_hash(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def minhash(normalized: str) -> np.ndarray:
+    """MinHash signature (uint32 per permutation) of the text's character shingles.
+
+    Character shingles keep a typo or a changed word to a handful of changed shingles,
+    so a near-verbatim paste keeps a high Jaccard similarity with the stored text.
+    """
+    prime = np.uint64(MINHASH_PRIME)
+    hashes = np.array([zlib.crc32(shingle.encode()) for shingle in shingles(normalized)], dtype=np.uint64) % prime
+    # Both factors are below 2**32, so the product fits in uint64
+    permuted = (hashes[:, None] * _MINHASH_A % prime + _MINHASH_B) % prime
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+class DuplicateIndex:
+    """In-memory exact and near-duplicate lookup of stored question texts.
+
+    Exact matches are found by a hash of the normalized text. Near-verbatim matches use
+    MinHash with LSH banding: the signature is cut into MINHASH_BANDS bands, questions
+    sharing any band with the query are candidates, and candidates are kept when they
+    contain the same numbers ("a train 150 m long" and "a train 200 m long" are
+    different questions) and the fraction of agreeing signature values, an estimate of
+    the Jaccard similarity of their shingle sets, is within ESTIMATE_SLACK of
+    `min_jaccard`. The estimate has a standard error of about 0.06, so callers confirm
+    near duplicates with shingle_jaccard on the stored text.
+
+    Only hashes, signatures and subjects are kept (about 400 bytes per question) and
+    the index follows writes as a secondary-index listener. With a `path` the entries
+    are saved to a snapshot on close() and loaded from it on open, so startup skips
+    the MinHash pass over every stored question. The first write after opening deletes
+    the snapshot, so a process that stops without close() leaves none behind and the
+    next start rebuilds from collection metadata.
+    """
+
+    def __init__(self, min_jaccard: float = 0.8, path: Optional[str] = None):
+        self.min_jaccard = min_jaccard
+        self.path = path
+        self._snapshot_path = os.path.join(path, "duplicates.npz") if path else None
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self._entries: Dict[str, Tuple[str, np.ndarray, tuple, str]] = {}
+        self._by_hash: Dict[str, Set[str]] = {}
+        self._bands: List[Dict[bytes, Set[str]]] = [{} for _ in range(MINHASH_BANDS)]
+        # True while the snapshot on disk matches memory
+        self._saved = False
+
+    def _load(self) -> None:
+        if not self._snapshot_path or not os.path.exists(self._snapshot_path):
+            return
+        with np.load(self._snapshot_path) as arrays:
+            for id_, digest, signature, numbers, subject in zip(
+                arrays["ids"].tolist(),
+                arrays["digests"].tolist(),
+                arrays["signatures"],
+                arrays["numbers"].tolist(),
+                arrays["subjects"].tolist(),
+            ):
+                self._insert(id_, digest, signature, tuple(numbers.split()), subject)
+        self._saved = True
+
+    def _save_snapshot(self) -> None:
+        ids = list(self._entries)
+        entries = [self._entries[id_] for id_ in ids]
+        with open(self._snapshot_path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                ids=np.array(ids, dtype=str),
+                digests=np.array([entry[0] for entry in entries], dtype=str),
+                signatures=np.array([entry[1] for entry in entries], dtype=np.uint32).reshape(
+                    len(entries), MINHASH_PERMUTATIONS
+                ),
+                numbers=np.array([" ".join(entry[2]) for entry in entries], dtype=str),
+                subjects=np.array([entry[3] for entry in entries], dtype=str),
+            )
+        os.replace(self._snapshot_path + ".tmp", self._snapshot_path)
+        self._saved = True
+
+    def _invalidate(self) -> None:
+        """Drop the snapshot before memory diverges from it; lock held"""
+        if self._saved:
+            os.remove(self._snapshot_path)
+            self._saved = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidate()
+            self._reset()
+
+    def close(self) -> None:
+        """Write a snapshot so the next start loads it instead of rebuilding"""
+        with self._lock:
+            if self._snapshot_path and not self._saved:
+                self._save_snapshot()
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in np.split(signature, MINHASH_BANDS)]
+
+    def _remove(self, id_: str) -> None:
+        entry = self._entries.pop(id_, None)
+        if entry is None:
+            return
+        digest, signature, _, _ = entry
+        self._by_hash[digest].discard(id_)
+        if not self._by_hash[digest]:
+            del self._by_hash[digest]
+        for band, key in zip(self._bands, self._band_keys(signature)):
+            band[key].discard(id_)
+            if not band[key]:
+                del band[key]
+
+    def _insert(self, id_: str, digest: str, signature: np.ndarray, numbers: tuple, subject: str) -> None:
+        self._entries[id_] = (digest, signature, numbers, subject)
+        self._by_hash.setdefault(digest, set()).add(id_)
+        for band, key in zip(self._bands, self._band_keys(signature)):
+            band.setdefault(key, set()).add(id_)
+
+    def add(self, ids: Sequence[str], embeddings, metadatas: Sequence[Dict]) -> None:
+        """Index (or re-index) questions; the index listener signature ignores embeddings"""
+        with self._lock:
+            self._invalidate()
+            for id_, metadata in zip(ids, metadatas):
+                self._remove(id_)
+                normalized = normalize_question(metadata.get("text", ""))
+                if not normalized:
+                    continue
+                numbers = tuple(NUMBER_PATTERN.findall(normalized))
+                self._insert(
+                    id_, text_hash(normalized), minhash(normalized), numbers, metadata.get("subject", "")
+                )
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._invalidate()
+            for id_ in ids:
+                self._remove(id_)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, text: str, limit: int = 5, subject: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Stored questions matching `text`, as (id, estimated Jaccard similarity) pairs.
+
+        Exact normalized matches come first with 1.0, then near-duplicate candidates by
+        decreasing estimate; `subject` restricts matches to that subject.
+        """
+        normalized = normalize_question(text)
+        if not normalized or limit <= 0:
+            return []
+        digest, signature = text_hash(normalized), minhash(normalized)
+        numbers = tuple(NUMBER_PATTERN.findall(normalized))
+
+        with self._lock:
+            found = {id_: 1.0 for id_ in self._by_hash.get(digest, ())}
+            candidates = set()
+            for band, key in zip(self._bands, self._band_keys(signature)):
+                candidates |= band.get(key, set())
+            for id_ in candidates - found.keys():
+                _, stored_signature, stored_numbers, _ = self._entries[id_]
+                if stored_numbers != numbers:
+                    continue
+                # Capped below 1.0 so a near duplicate never outranks an exact match
+                similarity = min(float(np.mean(stored_signature == signature)), 0.999)
+                if similarity >= self.min_jaccard - ESTIMATE_SLACK:
+                    found[id_] = similarity
+            if subject:
+                found = {id_: s for id_, s in found.items() if self._entries[id_][3] == subject}
+
+        return sorted(found.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def stats(self) -> dict:
+        return {"questions": len(self), "distinct_texts": len(self._by_hash), "min_jaccard": self.min_jaccard}
@@ -0,0 +1,172 @@
+"""
+Embedding backends for ChromaClient.
+
+`sentence-transformers` (default) runs the PyTorch model through SentenceTransformer.
+`onnx` runs an exported, int8-quantized ONNX copy of the same model with ONNX Runtime:
+same tokenizer, mean pooling over the attention mask and L2 normalization, so its
+vectors agree with the PyTorch ones (see benchmarks/bench_embedding_backends.py) at a
+fraction of the CPU time and resident memory, and without importing torch.
+
+Export the ONNX model once with:
+    python -m app.embedding_backends --output ./onnx_model
+"""
+
+import argparse
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+# Token limit of all-MiniLM-L6-v2 in sentence-transformers; longer inputs are truncated
+MAX_SEQ_LENGTH = 256
+
+ONNX_MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+
+
+class EmbeddingBackend(ABC):
+    """Interface: turn a list of texts into a (len(texts), dim) float32 matrix"""
+
+    # Identifies the vectors a backend produces (embedding store and query cache namespace)
+    name: str
+
+    @abstractmethod
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        ...
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime backend for an exported sentence-transformers model directory.
+
+    The directory holds `model_quantized.onnx` (or `model.onnx`) and the model's
+    `tokenizer.json`, as written by `export_onnx_model`.
+    """
+
+    def __init__(self, model_dir: str, model_name: str = DEFAULT_MODEL_NAME, threads: Optional[int] = None):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError("The onnx embedding backend needs onnxruntime and tokenizers installed: " + str(e))
+
+        model_path = next(
+            (os.path.join(model_dir, f) for f in ONNX_MODEL_FILES if os.path.exists(os.path.join(model_dir, f))), None
+        )
+        if model_path is None:
+            raise RuntimeError(
+                f"No ONNX model in {model_dir}; export one with: python -m app.embedding_backends --output {model_dir}"
+            )
+
+        quantized = os.path.basename(model_path) == "model_quantized.onnx"
+        self.name = f"{model_name}-onnx{'-int8' if quantized else ''}"
+        self.model_path = model_path
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        threads = threads if threads is not None else int(os.getenv("ONNX_THREADS", 0))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        # Mean pooling over real tokens, then L2 normalization (the model's Normalize layer)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack([self._encode_batch(texts[i : i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+
+def create_embedding_backend(model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None) -> EmbeddingBackend:
+    """Build the backend named by `backend` or EMBEDDING_BACKEND (sentence-transformers | onnx)"""
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", "sentence-transformers")).lower()
+    if backend == "onnx":
+        return OnnxBackend(os.getenv("ONNX_MODEL_PATH", "./onnx_model"), model_name)
+    if backend in ("sentence-transformers", "sentence_transformers", "torch"):
+        return SentenceTransformerBackend(model_name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+
+def export_onnx_model(output_dir: str, model_name: str = DEFAULT_MODEL_NAME, quantize: bool = True) -> str:
+    """Export the transformer of a sentence-transformers model to ONNX, optionally int8-quantized.
+
+    Needs torch and sentence-transformers (export time only) plus onnxruntime for the
+    dynamic quantization. Returns the path of the model file the onnx backend will load.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    if not quantize:
+        return fp32_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(output_dir, "model_quantized.onnx")
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a sentence-transformers model for the onnx backend")
+    parser.add_argument("--output", default="./onnx_model", help="directory for the ONNX model and tokenizer")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--no-quantize", action="store_true", help="keep only the float32 model")
+    args = parser.parse_args()
+
+    path = export_onnx_model(args.output, args.model, quantize=not args.no_quantize)
+    print(f"Exported {args.model} to {path}")
+
+
+if __name__ == "__main__":
+    main()
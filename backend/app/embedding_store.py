@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer process only
+    fcntl = None
+
+# Index records: 16-byte text digest + row number in the vector file
+INDEX_DTYPE = np.dtype([("key", "S16"), ("row", "<u4")])
+
+
+class EmbeddingStore:
+    """Persistent, append-only embedding store keyed by (model name, text hash).
+
+    Vectors live in a raw float16/float32 matrix file that is only ever appended to and
+    is read through a read-only memory map, so lookups return views into the page cache
+    instead of Python objects. A companion index file holds one fixed-size
+    (digest, row) record per vector; on open it is loaded into a sorted NumPy array and
+    searched with `searchsorted`, and entries added since then sit in a small dict.
+
+    A crash between the two appends can only leave an unindexed vector behind, never
+    an index record pointing past the end of the matrix.
+
+    Several processes (uvicorn workers, a background ingest) may share the directory:
+    appends hold an exclusive flock on a lock file and first pick up the rows other
+    writers added, so row numbers come from the files, not from this process's count.
+    Without fcntl (Windows) only one process may write to a store.
+    """
+
+    def __init__(self, path: str, model_name: str, dtype: Optional[str] = None):
+        self.path = path
+        self.model_name = model_name
+        os.makedirs(path, exist_ok=True)
+
+        prefix = os.path.join(path, re.sub(r"[^\w.-]", "_", model_name))
+        self._meta_path = f"{prefix}.meta.json"
+        self._vectors_path = f"{prefix}.vectors"
+        self._index_path = f"{prefix}.index"
+        self._lock_path = f"{prefix}.lock"
+
+        self.dtype = np.dtype(dtype or os.getenv("EMBEDDING_STORE_DTYPE", "float16"))
+        self.dim: Optional[int] = None
+        self._read_meta()
+
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._index_bytes = 0
+        self._mmap: Optional[np.memmap] = None
+        self._keys = np.empty(0, dtype="S16")
+        self._key_rows = np.empty(0, dtype="<u4")
+        self._recent: Dict[bytes, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.dim is not None:
+            with self._file_lock():
+                self._load()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(text.encode()).digest()[:16]
+
+    def _read_meta(self) -> None:
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self.dtype = np.dtype(meta["dtype"])
+            self.dim = meta["dim"]
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process using this store (no-op without fcntl)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _file_sizes(self):
+        """(complete rows, complete index bytes) on disk, dropping torn tails; file lock held"""
+        row_bytes = self.dim * self.dtype.itemsize
+        vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        rows = vector_bytes // row_bytes
+        if vector_bytes % row_bytes:
+            # Drop a partially written row so later appends stay aligned
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * row_bytes)
+
+        index_bytes = os.path.getsize(self._index_path) if os.path.exists(self._index_path) else 0
+        if index_bytes % INDEX_DTYPE.itemsize:
+            index_bytes -= index_bytes % INDEX_DTYPE.itemsize
+            with open(self._index_path, "r+b") as f:
+                f.truncate(index_bytes)
+        return rows, index_bytes
+
+    def _load(self) -> None:
+        self._rows, self._index_bytes = self._file_sizes()
+        if self._index_bytes:
+            records = np.fromfile(self._index_path, dtype=INDEX_DTYPE)
+            # Ignore records whose vector write never completed
+            records = records[records["row"] < self._rows]
+            records = records[np.argsort(records["key"], kind="stable")]
+            self._keys = records["key"]
+            self._key_rows = records["row"]
+        self._remap()
+
+    def _sync(self) -> None:
+        """Pick up vectors other processes appended since we last looked; file lock held"""
+        rows, index_bytes = self._file_sizes()
+        if index_bytes > self._index_bytes:
+            records = np.fromfile(
+                self._index_path,
+                dtype=INDEX_DTYPE,
+                count=(index_bytes - self._index_bytes) // INDEX_DTYPE.itemsize,
+                offset=self._index_bytes,
+            )
+            for key, row in zip(records["key"].tolist(), records["row"].tolist()):
+                if row < rows:
+                    # "S16" values come back without trailing NUL bytes
+                    self._recent[key.ljust(16, b"\0")] = row
+            self._index_bytes = index_bytes
+        if rows != self._rows:
+            self._rows = rows
+            self._remap()
+
+    def _remap(self) -> None:
+        if self._rows:
+            self._mmap = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dim))
+        else:
+            self._mmap = None
+
+    def _find_row(self, key: bytes) -> Optional[int]:
+        row = self._recent.get(key)
+        if row is not None:
+            return row
+        position = np.searchsorted(self._keys, key)
+        # NumPy "S" values drop trailing NUL bytes, so compare the stripped digest
+        if position < len(self._keys) and self._keys[position] == key.rstrip(b"\0"):
+            return int(self._key_rows[position])
+        return None
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up stored vectors; entries are memory-mapped views or None when missing"""
+        with self._lock:
+            results: List[Optional[np.ndarray]] = []
+            for text in texts:
+                row = self._find_row(self.key(text)) if self._mmap is not None else None
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(self._mmap[row])
+            return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Append vectors for texts that are not stored yet"""
+        if not texts:
+            return
+
+        with self._lock, self._file_lock():
+            if self.dim is None:
+                # Another process may have created the store since we opened it
+                self._read_meta()
+            if self.dim is None:
+                self.dim = int(np.shape(vectors)[1])
+                with open(self._meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim, "dtype": self.dtype.name}, f)
+            self._sync()
+            matrix = np.asarray(vectors, dtype=self.dtype)
+
+            keys, rows, seen = [], [], set()
+            for vector_index, text in enumerate(texts):
+                key = self.key(text)
+                if key in seen or self._find_row(key) is not None:
+                    continue
+                seen.add(key)
+                keys.append(key)
+                rows.append(vector_index)
+            if not keys:
+                return
+
+            records = np.empty(len(keys), dtype=INDEX_DTYPE)
+            records["key"] = keys
+            records["row"] = np.arange(self._rows, self._rows + len(keys), dtype="<u4")
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(matrix[rows]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._index_path, "ab") as f:
+                f.write(records.tobytes())
+
+            for key, row in zip(keys, records["row"]):
+                self._recent[key] = int(row)
+            self._rows += len(keys)
+            self._index_bytes += records.nbytes
+            self._remap()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "vectors": self._rows,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "bytes_on_disk": self._rows * (self.dim or 0) * self.dtype.itemsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
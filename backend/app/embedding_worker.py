@@ -0,0 +1,115 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+
+class EmbeddingQueueFull(Exception):
+    """Raised when the embedding worker cannot accept more pending texts"""
+
+
+class EmbeddingWorker:
+    """Micro-batching embedding worker for request-time queries.
+
+    Callers await `embed(text)`. A single consumer task takes the first pending text,
+    keeps collecting for up to `batch_window_ms` (or until `max_batch_size` texts are
+    queued) and encodes the batch with one `encode_fn` call in a worker thread, so the
+    event loop never runs the model. Each caller receives its own vector.
+
+    Settings default to the EMBED_BATCH_WINDOW_MS, EMBED_MAX_BATCH and EMBED_QUEUE_SIZE
+    environment variables.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        batch_window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+    ):
+        self.encode_fn = encode_fn
+        if batch_window_ms is None:
+            batch_window_ms = float(os.getenv("EMBED_BATCH_WINDOW_MS", 3))
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBED_MAX_BATCH", 32))
+        self.max_queue_size = max_queue_size or int(os.getenv("EMBED_QUEUE_SIZE", 1024))
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-worker")
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue a text for the next batch and wait for its embedding"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            raise EmbeddingQueueFull(f"Embedding queue is full ({self.max_queue_size} pending texts)")
+        return await future
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.batch_window
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests cancelled while waiting (client disconnects) need no encoding
+        return [(text, future) for text, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self.encode_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": (self.texts / self.batches) if self.batches else 0.0,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    async def stop(self) -> None:
+        """Cancel the consumer task; the worker restarts on the next embed() call"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
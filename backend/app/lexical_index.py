@@ -0,0 +1,335 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Word characters only, so numbers, years and act/article numbers stay whole tokens
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def document_text(metadata: Dict) -> str:
+    """Indexed text of a question: its text followed by its options"""
+    options = metadata.get("options") or []
+    if isinstance(options, str):
+        try:
+            options = json.loads(options)
+        except ValueError:
+            options = [options]
+    if not isinstance(options, list):
+        options = [options]
+    return " ".join([metadata.get("text") or ""] + [str(option) for option in options])
+
+
+class BM25Index:
+    """Incremental BM25 inverted index over question text and options.
+
+    Postings are array-backed: one `array("I")` of document numbers and one
+    `array("H")` of term frequencies per term, appended to as questions arrive.
+    Deleting or replacing a question tombstones its document number (a re-add whose
+    text and options are unchanged only swaps the stored metadata); document
+    frequencies and the average length are computed over live documents only, so
+    scores match a freshly built index. Once more than a quarter of the document
+    numbers are dead, the next snapshot renumbers the live documents and drops dead
+    postings, terms and metadata.
+
+    State is persisted as a snapshot (postings concatenated into NumPy arrays plus a
+    JSON table of terms and documents, in one .npz file so a single rename commits
+    both) and a sequence-numbered write log. Opening the
+    index loads the snapshot and replays the log entries written after it, so startup
+    never re-tokenizes the corpus; a new snapshot is written every `snapshot_every`
+    logged writes and on close().
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, snapshot_every: Optional[int] = None):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.snapshot_every = snapshot_every or int(os.getenv("BM25_SNAPSHOT_EVERY", 1000))
+        os.makedirs(path, exist_ok=True)
+        self._arrays_path = os.path.join(path, "bm25.npz")
+        # Separate table file of older snapshots, read when the .npz has no table
+        self._table_path = os.path.join(path, "bm25.json")
+        self._log_path = os.path.join(path, "bm25.log.jsonl")
+
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self._terms: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._doc_ids: List[str] = []
+        self._doc_metadata: List[Dict] = []
+        self._doc_of: Dict[str, int] = {}
+        self._doc_len = np.zeros(0, dtype=np.uint32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._docs = 0
+        self._live_length = 0
+        self._seq = 0
+        self._snapshot_seq = 0
+
+    def _load(self) -> None:
+        if os.path.exists(self._arrays_path):
+            arrays = np.load(self._arrays_path)
+            if "table" in arrays:
+                table = json.loads(arrays["table"].tobytes())
+            else:
+                with open(self._table_path) as f:
+                    table = json.load(f)
+
+            offsets, docs, tfs = arrays["offsets"], arrays["docs"], arrays["tfs"]
+            self._terms = {term: term_id for term_id, term in enumerate(table["terms"])}
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                self._postings_docs.append(array("I", docs[start:end].tobytes()))
+                self._postings_tfs.append(array("H", tfs[start:end].tobytes()))
+
+            self._doc_ids = table["doc_ids"]
+            self._doc_metadata = table["doc_metadata"]
+            self._docs = len(self._doc_ids)
+            self._doc_len = arrays["doc_len"].copy()
+            self._alive = arrays["alive"].copy()
+            self._doc_of = {id_: doc for doc, id_ in enumerate(self._doc_ids) if self._alive[doc]}
+            self._live_length = int(self._doc_len[: self._docs][self._alive[: self._docs]].sum())
+            self._seq = self._snapshot_seq = table["seq"]
+
+        if os.path.exists(self._log_path):
+            with open(self._log_path, "rb+") as f:
+                valid_bytes = 0
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-append; cut it so new entries
+                        # are not appended onto it
+                        f.truncate(valid_bytes)
+                        break
+                    valid_bytes += len(line)
+                    if entry["seq"] <= self._seq:
+                        continue
+                    if "delete" in entry:
+                        self._remove_doc(entry["delete"])
+                    else:
+                        self._add_doc(entry["add"], entry["metadata"])
+                    self._seq = entry["seq"]
+
+        if self._docs and self._docs - len(self._doc_of) > self._docs // 4:
+            self._save_snapshot()
+
+    def _compact(self) -> None:
+        """Renumber live documents in order, dropping dead postings, terms and metadata"""
+        alive = self._alive[: self._docs]
+        live = np.flatnonzero(alive)
+        new_doc = (np.cumsum(alive) - 1).astype(np.uint32)
+
+        terms: Dict[str, int] = {}
+        postings_docs: List[array] = []
+        postings_tfs: List[array] = []
+        for term, term_id in self._terms.items():
+            docs = np.frombuffer(self._postings_docs[term_id], dtype=np.uint32)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            terms[term] = len(postings_docs)
+            postings_docs.append(array("I", new_doc[docs[keep]].tobytes()))
+            postings_tfs.append(array("H", np.frombuffer(self._postings_tfs[term_id], dtype=np.uint16)[keep].tobytes()))
+
+        self._terms, self._postings_docs, self._postings_tfs = terms, postings_docs, postings_tfs
+        self._doc_ids = [self._doc_ids[doc] for doc in live]
+        self._doc_metadata = [self._doc_metadata[doc] for doc in live]
+        self._doc_of = {id_: doc for doc, id_ in enumerate(self._doc_ids)}
+        self._doc_len = self._doc_len[live].copy()
+        self._alive = np.ones(len(live), dtype=bool)
+        self._docs = len(live)
+
+    def _save_snapshot(self) -> None:
+        if self._docs - len(self._doc_of) > self._docs // 4:
+            self._compact()
+        lengths = [len(postings) for postings in self._postings_docs]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        docs = np.concatenate([np.frombuffer(p, dtype=np.uint32) for p in self._postings_docs] or [np.zeros(0, np.uint32)])
+        tfs = np.concatenate([np.frombuffer(p, dtype=np.uint16) for p in self._postings_tfs] or [np.zeros(0, np.uint16)])
+
+        terms = sorted(self._terms, key=self._terms.get)
+        table = json.dumps(
+            {"seq": self._seq, "terms": terms, "doc_ids": self._doc_ids, "doc_metadata": self._doc_metadata}
+        ).encode()
+
+        with open(self._arrays_path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                offsets=offsets,
+                docs=docs,
+                tfs=tfs,
+                doc_len=self._doc_len[: self._docs],
+                alive=self._alive[: self._docs],
+                table=np.frombuffer(table, dtype=np.uint8),
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        # Postings and table are one file, so a crash leaves either snapshot whole; the
+        # log is cut only after the new one is in place
+        os.replace(self._arrays_path + ".tmp", self._arrays_path)
+        if os.path.exists(self._table_path):
+            os.remove(self._table_path)
+        open(self._log_path, "w").close()
+        self._snapshot_seq = self._seq
+
+    def _log(self, entries: List[Dict]) -> None:
+        with open(self._log_path, "a") as f:
+            for entry in entries:
+                self._seq += 1
+                f.write(json.dumps({"seq": self._seq, **entry}) + "\n")
+        if self._seq - self._snapshot_seq >= self.snapshot_every:
+            self._save_snapshot()
+
+    def _add_doc(self, id_: str, metadata: Dict) -> None:
+        text = document_text(metadata)
+        doc = self._doc_of.get(id_)
+        if doc is not None and document_text(self._doc_metadata[doc]) == text:
+            # Metadata-only change (answer, subject, ...): postings stay as they are
+            self._doc_metadata[doc] = metadata
+            return
+        self._remove_doc(id_)
+        tokens = tokenize(text)
+
+        doc = self._docs
+        if doc >= len(self._alive):
+            capacity = max(1024, 2 * len(self._alive))
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+            self._doc_len = np.concatenate([self._doc_len, np.zeros(capacity - len(self._doc_len), dtype=np.uint32)])
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, count in counts.items():
+            term_id = self._terms.get(term)
+            if term_id is None:
+                term_id = self._terms[term] = len(self._postings_docs)
+                self._postings_docs.append(array("I"))
+                self._postings_tfs.append(array("H"))
+            self._postings_docs[term_id].append(doc)
+            self._postings_tfs[term_id].append(min(count, 65535))
+
+        self._doc_ids.append(id_)
+        self._doc_metadata.append(metadata)
+        self._doc_of[id_] = doc
+        self._doc_len[doc] = len(tokens)
+        self._alive[doc] = True
+        self._live_length += len(tokens)
+        self._docs += 1
+
+    def _remove_doc(self, id_: str) -> bool:
+        doc = self._doc_of.pop(id_, None)
+        if doc is None:
+            return False
+        self._alive[doc] = False
+        self._live_length -= int(self._doc_len[doc])
+        return True
+
+    def add(self, ids: Sequence[str], embeddings, metadatas: Sequence[Dict]) -> None:
+        """Index (or re-index) questions; the index listener signature ignores embeddings"""
+        with self._lock:
+            for id_, metadata in zip(ids, metadatas):
+                self._add_doc(id_, metadata)
+            self._log([{"add": id_, "metadata": metadata} for id_, metadata in zip(ids, metadatas)])
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            removed = [id_ for id_ in ids if self._remove_doc(id_)]
+            if removed:
+                self._log([{"delete": id_} for id_ in removed])
+
+    def clear(self) -> None:
+        with self._lock:
+            for file_path in (self._arrays_path, self._table_path, self._log_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self._reset()
+
+    def close(self) -> None:
+        """Write a snapshot so the next start has no log to replay"""
+        with self._lock:
+            if self._seq != self._snapshot_seq:
+                self._save_snapshot()
+
+    def __len__(self) -> int:
+        return len(self._doc_of)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        subjects: Optional[Sequence[str]] = None,
+        years: Optional[Sequence[int]] = None,
+        paper_types: Optional[Sequence[str]] = None,
+    ) -> List[Dict]:
+        """BM25 top-k, best first; each hit is {"id", "metadata", "score"}"""
+        filters = [
+            (field, set(values))
+            for field, values in (("subject", subjects), ("year", years), ("paper_type", paper_types))
+            if values
+        ]
+
+        with self._lock:
+            live_docs = len(self._doc_of)
+            if not live_docs or top_k <= 0:
+                return []
+            average_length = self._live_length / live_docs
+            alive = self._alive[: self._docs]
+            scores = np.zeros(self._docs, dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    continue
+                docs = np.array(self._postings_docs[term_id], dtype=np.int64)
+                tfs = np.array(self._postings_tfs[term_id], dtype=np.float32)
+                live = alive[docs]
+                docs, tfs = docs[live], tfs[live]
+                if not len(docs):
+                    continue
+
+                idf = math.log(1 + (live_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                lengths = self._doc_len[docs] / average_length
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths))
+
+            matched = np.flatnonzero(scores)
+            # Filters are checked best-first on a top slice that widens until top_k pass
+            fetch = top_k * 4 if filters else top_k
+            while True:
+                if len(matched) > fetch:
+                    shortlist = matched[np.argpartition(-scores[matched], fetch - 1)[:fetch]]
+                else:
+                    shortlist = matched
+                shortlist = shortlist[np.argsort(-scores[shortlist], kind="stable")]
+
+                hits = []
+                for doc in shortlist:
+                    metadata = self._doc_metadata[doc]
+                    if all(metadata.get(field) in values for field, values in filters):
+                        hits.append({"id": self._doc_ids[doc], "metadata": metadata, "score": float(scores[doc])})
+                        if len(hits) == top_k:
+                            return hits
+                if len(shortlist) == len(matched):
+                    return hits
+                fetch *= 4
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self),
+            "dead_documents": self._docs - len(self._doc_of),
+            "terms": len(self._terms),
+            "postings": sum(len(postings) for postings in self._postings_docs),
+            "unsnapshotted_writes": self._seq - self._snapshot_seq,
+        }
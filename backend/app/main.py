@@ -1,36 +1,134 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
 import os
+import tempfile
+import threading
+import time
 import uuid
+import zlib
 from datetime import datetime
+from typing import Optional
 
-from fastapi import BackgroundTasks, FastAPI, File, HTTPException, UploadFile
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from multipart.multipart import MultipartParser, parse_options_header
 
 # Import our models and clients
-from .models import (AdvancedQueryRequest, BatchQuestionsRequest,
-                     BatchQuestionsResponse, HealthResponse,
-                     MatchResponse, ParseTextResponse,
-                     ProcessResponse, ProcessS3Request,
+from .dedupe import find_duplicate_clusters, merge_clusters
+from .embedding_worker import EmbeddingQueueFull, EmbeddingWorker
+from .models import (AdvancedQueryRequest, BatchQueryRequest,
+                     BatchQueryResponse, BatchQuestionsRequest,
+                     BatchQuestionsResponse, BulkDeleteRequest,
+                     BulkOperationResponse, BulkUpdateRequest,
+                     CacheStatsResponse, DedupeRequest,
+                     HealthResponse,
+                     MatchResponse, PaginationParams, ParsedQuestion, ParseTextResponse,
+                     ProcessResponse, ProcessS3Request, ReadinessResponse,
                      ProcessTextRequest, QueryRequest, QueryResponse,
-                     QuestionCreate, QuestionResponse, StatsResponse,
+                     QuestionCreate, QuestionPage, QuestionResponse,
+                     QuestionUpdate, SearchFilters, StatsResponse,
                      SubjectsResponse, SuccessResponse)
 from .question_processor import create_question_processor
 from .s3_client import S3Client
 
 
+logger = logging.getLogger(__name__)
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
 # Lazy chroma client: defer importing heavy ML and Chroma deps until first use.
 class LazyChromaClient:
+    """Builds the ChromaClient once, on first use or at startup (CHROMA_STARTUP_MODE).
+
+    Initialization is lock-protected, so concurrent first requests wait for a single
+    model load instead of each building their own. `warm_up` additionally runs one
+    dummy encode so the first real query does not pay for kernel/allocator warm-up.
+    """
+
     def __init__(self):
         self._client = None
+        self._lock = threading.Lock()
+        self.warmed_up = False
+        self.init_error = None
+        self.startup_timings = {}
+
+    def _timed(self, phase: str, start: float) -> None:
+        self.startup_timings[phase] = round(time.perf_counter() - start, 3)
+        logger.info(f"Startup phase {phase} took {self.startup_timings[phase]:.3f}s")
 
     def _ensure(self):
-        if self._client is None:
-            try:
-                from .chroma_client import ChromaClient
-            except Exception as e:
-                raise RuntimeError("ChromaClient import failed: " + str(e))
-            self._client = ChromaClient()
+        if self._client is not None:
+            return self._client
+        if _on_event_loop():
+            # Loading here would stall every request, /health/live included
+            raise RuntimeError("ChromaClient is not loaded; use `await chroma_client.acquire()` on the event loop")
+        with self._lock:
+            if self._client is None:
+                start = time.perf_counter()
+                try:
+                    from .chroma_client import ChromaClient
+                except Exception as e:
+                    self.init_error = "ChromaClient import failed: " + str(e)
+                    raise RuntimeError(self.init_error)
+                self._timed("import", start)
+
+                start = time.perf_counter()
+                try:
+                    client = ChromaClient()
+                except Exception as e:
+                    self.init_error = "ChromaClient initialization failed: " + str(e)
+                    raise
+                self._timed("client_init", start)
+                self.startup_timings.update(client.startup_timings)
+                self.init_error = None
+                self._client = client
         return self._client
 
+    @property
+    def loaded(self) -> bool:
+        return self._client is not None
+
+    async def acquire(self):
+        """The ChromaClient, for code running on the event loop.
+
+        Never blocks the loop: in lazy mode the first call loads the client in the
+        threadpool; in eager mode callers get 503 until the warm-up thread has built it.
+        """
+        if self._client is not None:
+            return self._client
+        if CHROMA_STARTUP_MODE == "eager":
+            raise HTTPException(
+                status_code=503, detail=self.init_error or "Service is starting", headers={"Retry-After": "5"}
+            )
+        return await run_in_threadpool(self._ensure)
+
+    def warm_up(self) -> None:
+        """Load the model and Chroma client and run one encode to warm them up"""
+        start = time.perf_counter()
+        client = self._ensure()
+        encode_start = time.perf_counter()
+        try:
+            client.encode_texts(["warm up"])
+        except Exception as e:
+            self.init_error = "Warm-up encode failed: " + str(e)
+            raise
+        self._timed("warm_up_encode", encode_start)
+        self._timed("total", start)
+        self.warmed_up = True
+
     def __getattr__(self, name):
         return getattr(self._ensure(), name)
 
@@ -55,11 +153,212 @@ app.add_middleware(
 # Initialize clients (chroma is lazy)
 s3_client = S3Client()
 chroma_client = LazyChromaClient()
-question_processor = create_question_processor()
+question_processor = create_question_processor(chroma_client)
+
+# Request-time query encoding is micro-batched off the event loop
+embedding_worker = EmbeddingWorker(lambda texts: chroma_client.encode_texts(texts))
 
 # Store processing jobs (in production, use Redis or database)
 processing_jobs = {}
 
+# Uploads are streamed to disk in chunks and rejected once they pass the size limit
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+# Room for the multipart envelope (boundaries, part headers) in the Content-Length precheck
+MULTIPART_OVERHEAD = 64 * 1024
+UPLOAD_SHA256 = os.getenv("UPLOAD_SHA256", "true").lower() in ("1", "true", "yes")
+
+# Listed by /subjects until questions have been ingested
+DEFAULT_SUBJECTS = [
+    "General Intelligence and Reasoning",
+    "Quantitative Aptitude",
+    "English Comprehension",
+    "General Awareness",
+    "Mathematics",
+    "Reasoning",
+    "English",
+    "GK",
+]
+
+
+# lazy: load on the first request that needs it; eager: load and warm up at startup,
+# in a background thread so /health/live answers while /health/ready reports 503
+CHROMA_STARTUP_MODE = os.getenv("CHROMA_STARTUP_MODE", "lazy").lower()
+
+
+@app.on_event("startup")
+async def start_chroma_warm_up():
+    if CHROMA_STARTUP_MODE != "eager":
+        return
+
+    def warm_up():
+        try:
+            chroma_client.warm_up()
+        except Exception as e:
+            logger.error(f"Chroma client warm-up failed: {e}")
+
+    threading.Thread(target=warm_up, name="chroma-warm-up", daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_embedding_worker():
+    await embedding_worker.stop()
+    question_processor.close()
+    if chroma_client.loaded:
+        chroma_client.close()
+
+
+async def embed_query(text: str):
+    """Encode a query, serving repeats from the query cache and batching the rest.
+
+    Only the in-memory tier is used on the event loop; the SQLite tier
+    (QUERY_CACHE_PATH) is read and written in the threadpool.
+    """
+    client = await chroma_client.acquire()
+    cache = client.query_cache
+    embedding = cache.get(text, disk=False)
+    if embedding is None and cache.disk_tier:
+        embedding = await run_in_threadpool(cache.get_disk, text)
+    if embedding is not None:
+        return embedding
+
+    try:
+        embedding = await embedding_worker.embed(text)
+    except EmbeddingQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    cache.put(text, embedding, disk=False)
+    if cache.disk_tier:
+        await run_in_threadpool(cache.put_disk, text, embedding)
+    return embedding
+
+
+async def cached_search(question: str, top_k: int, filters: dict, search):
+    """Serve a search from the result cache, or run `search(query_embedding)` and cache it.
+
+    The collection version is read before searching, so a write that lands mid-search
+    leaves the entry already stale.
+    """
+    client = await chroma_client.acquire()
+    cache_key = client.result_cache.make_key(question, top_k, filters)
+    version = client.version
+    results = client.result_cache.get(cache_key, version)
+    if results is None:
+        query_embedding = await embed_query(question)
+        results = await run_in_threadpool(search, query_embedding)
+        client.result_cache.put(cache_key, version, results)
+    return results
+
+
+def search_with_mode(question: str, query_embedding, top_k: int, search_mode: str, subject=None, filters=None):
+    """Run a vector, lexical or hybrid search for /query and /query-advanced"""
+    if search_mode == "vector":
+        if filters is None:
+            return chroma_client.search_by_embedding(query_embedding, top_k, subject)
+        return chroma_client.filtered_search(
+            query_embedding,
+            top_k,
+            subjects=filters.subjects,
+            years=filters.years,
+            paper_types=filters.paper_types,
+            min_similarity=filters.min_similarity,
+        )
+
+    return chroma_client.hybrid_search(
+        question,
+        query_embedding,
+        top_k,
+        subjects=filters.subjects if filters else ([subject] if subject else None),
+        years=filters.years if filters else None,
+        paper_types=filters.paper_types if filters else None,
+        min_similarity=filters.min_similarity if filters else None,
+        mode=search_mode,
+    )
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def receive_upload(request: Request, dest_path: str, field: str = "file"):
+    """Stream the `field` part of a multipart body straight to disk.
+
+    The body is parsed as it arrives, so MAX_UPLOAD_BYTES is enforced while receiving
+    and an oversized upload is answered with 413 without reading the rest. Nothing is
+    spooled first; the part is written to dest_path once. Returns (filename, bytes
+    written, sha256 hex digest or None); the partial file is removed on any failure.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", "").encode("latin-1"))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    digest = hashlib.sha256() if UPLOAD_SHA256 else None
+    state = {"header": b"", "headers": {}, "target": None, "filename": None, "size": 0}
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        name = state["header"].lower()
+        state["headers"][name] = state["headers"].get(name, b"") + data[start:end]
+
+    def on_header_end():
+        state["header"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name", b"").decode("latin-1") == field and state["filename"] is None:
+            state["filename"] = disposition.get(b"filename", b"").decode("utf-8", "replace")
+            state["target"] = f
+
+    def on_part_data(data, start, end):
+        if state["target"] is None:
+            return
+        chunk = data[start:end]
+        state["size"] += len(chunk)
+        if state["size"] > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge()
+        if digest is not None:
+            digest.update(chunk)
+        f.write(chunk)
+
+    def on_part_end():
+        state["target"] = None
+
+    parser = MultipartParser(
+        boundary,
+        callbacks={
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+    try:
+        with open(dest_path, "wb") as f:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except UploadTooLarge:
+                    raise HTTPException(
+                        status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit"
+                    )
+            parser.finalize()
+        if state["filename"] is None:
+            raise HTTPException(status_code=400, detail=f"Missing '{field}' file field")
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    return state["filename"], state["size"], digest.hexdigest() if digest is not None else None
+
 
 @app.get("/", response_model=SuccessResponse)
 async def root():
@@ -71,6 +370,7 @@ async def root():
             "description": "RAG-powered question search for SSC exams",
             "endpoints": {
                 "search": "/query",
+                "batch_search": "/query/batch",
                 "subjects": "/subjects",
                 "health": "/health",
                 "stats": "/stats",
@@ -83,13 +383,28 @@ async def root():
 @app.post("/query", response_model=QueryResponse)
 async def query_questions(request: QueryRequest):
     """Query similar questions from vector store"""
+    client = await chroma_client.acquire()
     try:
         start_time = datetime.now()
 
-        if request.subject:
-            results = chroma_client.search_by_subject(request.question, request.subject, request.top_k)
-        else:
-            results = chroma_client.semantic_search(request.question, request.top_k)
+        # A pasted stored question is answered from the duplicate index without an encode;
+        # vector search only fills the slots left over
+        results = await run_in_threadpool(
+            client.find_duplicates, request.question, request.top_k, request.subject
+        )
+        if len(results) < request.top_k:
+            fetch = request.top_k + len(results)
+            searched = await cached_search(
+                request.question,
+                fetch,
+                {"subject": request.subject, "search_mode": request.search_mode},
+                lambda query_embedding: search_with_mode(
+                    request.question, query_embedding, fetch, request.search_mode, subject=request.subject
+                ),
+            )
+            duplicate_ids = {match["question_id"] for match in results}
+            results += [match for match in searched if match["question_id"] not in duplicate_ids]
+            results = results[: request.top_k]
 
         search_time = (datetime.now() - start_time).total_seconds()
 
@@ -112,6 +427,78 @@ async def query_questions(request: QueryRequest):
             total_matches=len(match_responses),
             search_time=search_time,
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def batch_query_questions(request: BatchQueryRequest):
+    """Run several queries with a single encode call and grouped vector store queries"""
+    client = await chroma_client.acquire()
+    try:
+        start_time = datetime.now()
+
+        version = client.version
+        cache_keys = [
+            client.result_cache.make_key(
+                query.question, query.top_k, {"subject": query.subject, "search_mode": query.search_mode}
+            )
+            for query in request.queries
+        ]
+        results = [client.result_cache.get(key, version) for key in cache_keys]
+
+        # Lexical and hybrid queries need the BM25 side, so they are searched one by one
+        for i, query in enumerate(request.queries):
+            if results[i] is None and query.search_mode != "vector":
+                query_embedding = await embed_query(query.question)
+                results[i] = await run_in_threadpool(
+                    search_with_mode, query.question, query_embedding, query.top_k, query.search_mode, query.subject
+                )
+                client.result_cache.put(cache_keys[i], version, results[i])
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if pending:
+            searched = await run_in_threadpool(
+                client.batch_semantic_search,
+                [
+                    {
+                        "question": request.queries[i].question,
+                        "top_k": request.queries[i].top_k,
+                        "subject": request.queries[i].subject,
+                    }
+                    for i in pending
+                ],
+            )
+            for i, result in zip(pending, searched):
+                results[i] = result
+                client.result_cache.put(cache_keys[i], version, result)
+
+        search_time = (datetime.now() - start_time).total_seconds()
+
+        responses = [
+            QueryResponse(
+                question=query.question,
+                matches=[
+                    MatchResponse(
+                        question=match["question"],
+                        options=match["options"],
+                        correct_answer=match["correct_answer"],
+                        subject=match["subject"],
+                        similarity_score=match["similarity_score"],
+                        question_id=match["question_id"],
+                    )
+                    for match in result
+                ],
+                total_matches=len(result),
+            )
+            for query, result in zip(request.queries, results)
+        ]
+
+        return BatchQueryResponse(results=responses, total_queries=len(responses), search_time=search_time)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -122,9 +509,16 @@ async def advanced_query(request: AdvancedQueryRequest):
     try:
         start_time = datetime.now()
 
-        # For now, we'll use basic semantic search
-        # In future, implement filter support in ChromaClient
-        results = chroma_client.semantic_search(request.question, request.top_k)
+        # Without a filters object there is no similarity floor either
+        filters = request.filters or SearchFilters(min_similarity=None)
+        results = await cached_search(
+            request.question,
+            request.top_k,
+            {**filters.model_dump(), "search_mode": request.search_mode},
+            lambda query_embedding: search_with_mode(
+                request.question, query_embedding, request.top_k, request.search_mode, filters=filters
+            ),
+        )
 
         search_time = (datetime.now() - start_time).total_seconds()
 
@@ -146,6 +540,8 @@ async def advanced_query(request: AdvancedQueryRequest):
             total_matches=len(match_responses),
             search_time=search_time,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -178,38 +574,74 @@ async def process_s3_file(request: ProcessS3Request, background_tasks: Backgroun
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/process-file", response_model=ProcessResponse)
-async def process_file(file: UploadFile = File(...), namespace: str = "ssc-questions"):
-    """Process uploaded file"""
+@app.post(
+    "/process-file",
+    response_model=ProcessResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
+)
+async def process_file(request: Request, namespace: str = "ssc-questions"):
+    """Process uploaded file (multipart field `file`, a PDF)"""
+    temp_path = None
     try:
-        if not file.filename.lower().endswith(".pdf"):
-            raise HTTPException(status_code=400, detail="Only PDF files are supported")
+        # Reject oversized bodies up front when the client declares the length
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit")
 
         job_id = str(uuid.uuid4())
 
-        # Save uploaded file temporarily
-        temp_path = f"/tmp/{job_id}_{file.filename}"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Save uploaded file temporarily (the client's filename is not used in the path)
+        fd, temp_path = tempfile.mkstemp(prefix=f"{job_id}_", suffix=".pdf")
+        os.close(fd)
+        filename, size, sha256 = await receive_upload(request, temp_path)
+        if not filename.lower().endswith(".pdf"):
+            raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
         # Store job info
         processing_jobs[job_id] = {
             "status": "processing",
             "message": "File processing started",
             "started_at": datetime.now(),
+            "filename": filename,
+            "size_bytes": size,
+            "sha256": sha256,
         }
 
         # Process in background
         import asyncio
 
         asyncio.create_task(process_file_background(job_id, temp_path, namespace))
+        # The background task owns the file from here and removes it when done
+        temp_path = None
 
         return ProcessResponse(
-            job_id=job_id, status="processing", message="File upload and processing started", namespace=namespace
+            job_id=job_id,
+            status="processing",
+            message="File upload and processing started",
+            namespace=namespace,
+            sha256=sha256,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Rejected or failed uploads (bad content type, 413, non-PDF) leave nothing behind
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 @app.post("/process-text", response_model=ProcessResponse)
@@ -228,7 +660,7 @@ async def process_text(request: ProcessTextRequest):
         # Process in background
         import asyncio
 
-        asyncio.create_task(process_text_background(job_id, request.text_content, request.namespace))
+        asyncio.create_task(process_text_background(job_id, request.text_content, request.namespace, request.source))
 
         return ProcessResponse(
             job_id=job_id,
@@ -240,14 +672,70 @@ async def process_text(request: ProcessTextRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/parse-text", response_model=ParseTextResponse, responses={200: {"model": ParseTextResponse}})
-async def parse_text_sync(request: ProcessTextRequest):
+@app.post("/dedupe", response_model=ProcessResponse)
+async def dedupe_questions(request: DedupeRequest):
+    """Find near-duplicate questions across the collection (and optionally merge them)
+    in the background; poll /jobs/{job_id} for progress and clusters"""
+    try:
+        job_id = str(uuid.uuid4())
+
+        processing_jobs[job_id] = {
+            "status": "processing",
+            "message": f"Duplicate scan started ({request.mode})",
+            "started_at": datetime.now(),
+        }
+
+        import asyncio
+
+        asyncio.create_task(dedupe_background(job_id, request))
+
+        return ProcessResponse(
+            job_id=job_id,
+            status="processing",
+            message="Duplicate scan started in background",
+            namespace="ssc-questions",
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def iter_parsed_ndjson(text: str):
+    """One ParsedQuestion JSON object per line, then a {"status", "total"} trailer line"""
+    total = 0
+    try:
+        for parsed in question_processor.iter_text_questions(text):
+            yield ParsedQuestion(**parsed).model_dump_json() + "\n"
+            total += 1
+    except Exception as e:
+        # Headers are already sent, so failures are reported in the trailer
+        yield json.dumps({"status": "error", "detail": str(e), "total": total}) + "\n"
+        return
+    yield json.dumps({"status": "success", "total": total}) + "\n"
+
+
+@app.post(
+    "/parse-text",
+    response_model=ParseTextResponse,
+    responses={200: {"model": ParseTextResponse, "content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def parse_text_sync(http_request: Request, request: ProcessTextRequest, stream: bool = False):
     """Parse text content and extract questions without storing in Chroma.
 
     Returns a stable JSON payload with the parsed questions and a total count.
+    With `?stream=true` or `Accept: application/x-ndjson` the questions are streamed
+    as NDJSON, one ParsedQuestion per line as soon as it is parsed, followed by a
+    trailer line `{"status": "success", "total": N}`.
     """
+    if stream or NDJSON_MEDIA_TYPE in http_request.headers.get("accept", ""):
+        # Starlette iterates sync generators in the threadpool
+        return StreamingResponse(iter_parsed_ndjson(request.text_content), media_type=NDJSON_MEDIA_TYPE)
+
     try:
-        questions = question_processor.process_text_content(request.text_content)
+        # Large payloads are parsed in shards by a process pool; keep the event loop free meanwhile
+        questions = await run_in_threadpool(question_processor.process_text_content, request.text_content)
         return ParseTextResponse(status="success", questions=questions, total=len(questions))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -256,6 +744,7 @@ async def parse_text_sync(request: ProcessTextRequest):
 @app.post("/questions", response_model=QuestionResponse)
 async def create_question(question: QuestionCreate):
     """Create a new question manually"""
+    client = await chroma_client.acquire()
     try:
         question_data = {
             "id": f"manual_{uuid.uuid4().hex[:8]}",
@@ -269,7 +758,7 @@ async def create_question(question: QuestionCreate):
             "metadata": question.metadata,
         }
 
-        chroma_client.insert_question(question_data)
+        await run_in_threadpool(client.insert_question, question_data)
 
         return QuestionResponse(
             id=question_data["id"],
@@ -282,6 +771,9 @@ async def create_question(question: QuestionCreate):
             metadata=question.metadata,
             created_at=datetime.now(),
         )
+    except ValueError as e:
+        # Metadata that Chroma cannot store (reserved key or non-scalar value)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -289,48 +781,298 @@ async def create_question(question: QuestionCreate):
 @app.post("/questions/batch", response_model=BatchQuestionsResponse)
 async def create_questions_batch(request: BatchQuestionsRequest):
     """Create multiple questions in batch"""
+    client = await chroma_client.acquire()
     try:
-        processed = 0
-        errors = []
-
-        for question in request.questions:
-            try:
-                question_data = {
-                    "id": f"batch_{uuid.uuid4().hex[:8]}",
-                    "text": question.text,
-                    "options": question.options,
-                    "correct_answer": question.correct_answer,
-                    "subject": question.subject,
-                    "year": question.year,
-                    "paper_type": question.paper_type,
-                    "full_text": f"{question.text} Options: {', '.join(question.options)}",
-                    "metadata": question.metadata,
-                }
+        questions_data = [
+            {
+                "id": f"batch_{uuid.uuid4().hex[:8]}",
+                "text": question.text,
+                "options": question.options,
+                "correct_answer": question.correct_answer,
+                "subject": question.subject,
+                "year": question.year,
+                "paper_type": question.paper_type,
+                "full_text": f"{question.text} Options: {', '.join(question.options)}",
+                "metadata": question.metadata,
+            }
+            for question in request.questions
+        ]
+
+        result = await run_in_threadpool(client.batch_insert_questions, questions_data)
+
+        errors = [
+            f"Failed to process question {failure['index']}: {failure['error']}" for failure in result["failed"]
+        ]
+        return BatchQuestionsResponse(processed=result["inserted"], failed=len(errors), errors=errors)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.put("/questions/{question_id}", response_model=QuestionResponse)
+async def replace_question(question_id: str, question: QuestionCreate):
+    """Create or replace a question under a given id.
+
+    The stored record is rebuilt from the request body alone, so fields and metadata
+    it omits are reset or dropped. Written with a native upsert; the embedding is only
+    recomputed when the text or options differ from the stored question.
+    """
+    client = await chroma_client.acquire()
+    try:
+        question_data = {
+            "id": question_id,
+            "text": question.text,
+            "options": question.options,
+            "correct_answer": question.correct_answer,
+            "subject": question.subject,
+            "year": question.year,
+            "paper_type": question.paper_type,
+            "full_text": f"{question.text} Options: {', '.join(question.options)}",
+            "metadata": question.metadata,
+        }
+
+        result = await run_in_threadpool(client.update_question, question_id, question_data)
+        if result["failed"]:
+            raise HTTPException(status_code=400, detail=result["failed"][0]["error"])
+
+        return QuestionResponse(**await run_in_threadpool(client.get_question, question_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.patch("/questions/{question_id}", response_model=QuestionResponse)
+async def update_question(question_id: str, question: QuestionUpdate):
+    """Change some fields of a stored question; omitted fields are kept.
+
+    Metadata-only changes such as correct_answer reuse the stored embedding.
+    """
+    client = await chroma_client.acquire()
+    try:
+        changes = question.model_dump(exclude_unset=True)
+        result = await run_in_threadpool(client.update_questions, {question_id: changes})
+        if result["not_found"]:
+            raise HTTPException(status_code=404, detail="Question not found")
+        if result["failed"]:
+            raise HTTPException(status_code=400, detail=result["failed"][0]["error"])
+
+        return QuestionResponse(**await run_in_threadpool(client.get_question, question_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/questions/bulk-update", response_model=BulkOperationResponse)
+async def bulk_update_questions(request: BulkUpdateRequest):
+    """Apply field changes to many questions, in chunked collection writes.
+
+    Only questions whose text or options change are re-embedded, so answer-key
+    corrections across thousands of questions are metadata writes.
+    """
+    client = await chroma_client.acquire()
+    try:
+        updates = {}
+        for update in request.updates:
+            # Repeated ids are merged, later entries winning
+            updates.setdefault(update.id, {}).update(update.model_dump(exclude_unset=True, exclude={"id"}))
+
+        result = await run_in_threadpool(client.update_questions, updates)
+
+        errors = [f"Failed to update question {failure['id']}: {failure['error']}" for failure in result["failed"]]
+        return BulkOperationResponse(
+            processed=result["updated"],
+            reembedded=result["reembedded"],
+            unchanged=result["unchanged"],
+            not_found=result["not_found"],
+            failed=len(errors),
+            errors=errors,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/questions/bulk-delete", response_model=BulkOperationResponse)
+async def bulk_delete_questions(request: BulkDeleteRequest):
+    """Delete many questions, in chunked collection deletes"""
+    client = await chroma_client.acquire()
+    try:
+        result = await run_in_threadpool(client.delete_questions, request.ids)
+        return BulkOperationResponse(processed=result["deleted"], not_found=result["not_found"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def encode_cursor(after: str, page: int) -> str:
+    payload = json.dumps({"after": after, "page": page}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
 
-                chroma_client.insert_question(question_data)
-                processed += 1
-            except Exception as e:
-                errors.append(f"Failed to process question: {str(e)}")
 
-        return BatchQuestionsResponse(processed=processed, failed=len(errors), errors=errors)
+def decode_cursor(cursor: str):
+    """(after id, page number) from a next_cursor; 400 if it was not issued by us"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(payload["after"]), int(payload["page"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def pagination_params(
+    page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), cursor: Optional[str] = None
+) -> PaginationParams:
+    return PaginationParams(page=page, page_size=page_size, cursor=cursor)
+
+
+@app.get("/questions", response_model=QuestionPage)
+async def list_questions(
+    pagination: PaginationParams = Depends(pagination_params),
+    subject: Optional[str] = None,
+    year: Optional[int] = None,
+):
+    """Browse stored questions in id order.
+
+    Follow `next_cursor` for stable pagination: each page starts after the last id of
+    the previous one, so inserts and deletes elsewhere never shift or repeat rows.
+    `page` alone (without a cursor) jumps by offset.
+    """
+    client = await chroma_client.acquire()
+    try:
+        if pagination.cursor:
+            after, page = decode_cursor(pagination.cursor)
+            offset = 0
+        else:
+            after, page = None, pagination.page
+            offset = (page - 1) * pagination.page_size
+
+        records, last_id, has_more = await run_in_threadpool(
+            client.list_questions, pagination.page_size, after, offset, subject, year
+        )
+        total = await run_in_threadpool(client.aggregates.count_matching, subject, year)
+
+        return QuestionPage(
+            items=[QuestionResponse(**record) for record in records],
+            total=total,
+            page=page,
+            page_size=pagination.page_size,
+            total_pages=math.ceil(total / pagination.page_size),
+            next_cursor=encode_cursor(last_id, page + 1) if has_more else None,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Questions read from the collection per page while exporting
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 1000))
+
+
+def iter_export_ndjson(subject: Optional[str], year: Optional[int], include_embeddings: bool):
+    """One question JSON object per line, then a {"status", "total"} trailer line"""
+    total = 0
+    try:
+        for record in chroma_client.iter_questions(EXPORT_PAGE_SIZE, subject, year, include_embeddings):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+            total += 1
+    except Exception as e:
+        # Headers are already sent, so failures are reported in the trailer
+        yield json.dumps({"status": "error", "detail": str(e), "total": total}) + "\n"
+        return
+    yield json.dumps({"status": "success", "total": total}) + "\n"
+
+
+def gzip_stream(lines):
+    """Gzip a stream of text lines incrementally, flushing once per ~64KB of input"""
+    compressor = zlib.compressobj(wbits=31)
+    buffered = []
+    size = 0
+    for line in lines:
+        buffered.append(line.encode())
+        size += len(buffered[-1])
+        if size >= 64 * 1024:
+            yield compressor.compress(b"".join(buffered))
+            buffered, size = [], 0
+    yield compressor.compress(b"".join(buffered)) + compressor.flush()
+
+
+@app.get(
+    "/questions/export",
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}, "application/gzip": {}}}},
+)
+async def export_questions(
+    format: str = Query("ndjson", pattern="^(ndjson|gzip)$"),
+    subject: Optional[str] = None,
+    year: Optional[int] = None,
+    include_embeddings: bool = False,
+):
+    """Stream the collection (or a subject/year slice) as NDJSON, optionally gzipped.
+
+    Questions are read EXPORT_PAGE_SIZE at a time in id order, so memory stays flat
+    whatever the corpus size. The last line is a `{"status", "total"}` trailer.
+    """
+    # Starlette iterates sync generators in the threadpool
+    lines = iter_export_ndjson(subject, year, include_embeddings)
+    if format == "gzip":
+        return StreamingResponse(
+            gzip_stream(lines),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="questions.ndjson.gz"'},
+        )
+    return StreamingResponse(
+        lines,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="questions.ndjson"'},
+    )
+
+
+@app.get("/questions/{question_id}/similar", response_model=QueryResponse)
+async def get_similar_questions(question_id: str, top_k: int = Query(5, ge=1, le=50), subject: Optional[str] = None):
+    """Questions similar to a stored one, found from its stored embedding (no encode)"""
+    client = await chroma_client.acquire()
+    try:
+        start_time = datetime.now()
+
+        result = await run_in_threadpool(client.similar_questions, question_id, top_k, subject)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Question not found")
+        source, matches = result
+
+        search_time = (datetime.now() - start_time).total_seconds()
+
+        match_responses = [
+            MatchResponse(
+                question=match["question"],
+                options=match["options"],
+                correct_answer=match["correct_answer"],
+                subject=match["subject"],
+                similarity_score=match["similarity_score"],
+                question_id=match["question_id"],
+            )
+            for match in matches
+        ]
+
+        return QueryResponse(
+            question=source.get("text", ""),
+            matches=match_responses,
+            total_matches=len(match_responses),
+            search_time=search_time,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/subjects", response_model=SubjectsResponse)
 async def get_available_subjects():
-    """Get list of available subjects"""
-    subjects = [
-        "General Intelligence and Reasoning",
-        "Quantitative Aptitude",
-        "English Comprehension",
-        "General Awareness",
-        "Mathematics",
-        "Reasoning",
-        "English",
-        "GK",
-    ]
-    return SubjectsResponse(subjects=subjects)
+    """Get list of available subjects: those with stored questions, largest first"""
+    client = await chroma_client.acquire()
+    counts = client.aggregates.counts("subject")
+    counts.pop("", None)
+    if not counts:
+        # Nothing ingested yet; offer the standard SSC sections
+        return SubjectsResponse(subjects=DEFAULT_SUBJECTS)
+    return SubjectsResponse(subjects=list(counts), counts=counts)
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -338,7 +1080,8 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Check ChromaDB connection
-        chroma_client.get_collection_stats()
+        client = await chroma_client.acquire()
+        await run_in_threadpool(client.get_collection_stats)
         db_status = "healthy"
     except Exception as e:
         db_status = f"unhealthy: {str(e)}"
@@ -348,23 +1091,51 @@ async def health_check():
     )
 
 
+@app.get("/health/live", response_model=HealthResponse)
+async def liveness_check():
+    """Liveness probe: the process is up and serving; does not touch the model or database"""
+    return HealthResponse(status="alive", service="ssc-rag-api", timestamp=datetime.now(), version="1.0.0")
+
+
+@app.get("/health/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check():
+    """Readiness probe.
+
+    In eager mode the replica is ready once the model is loaded and warmed up, and
+    answers 503 until then (or after a failed warm-up). In lazy mode loading happens
+    on the first request, so the replica always reports ready.
+    """
+    if chroma_client.init_error:
+        status = "failed"
+    elif CHROMA_STARTUP_MODE == "eager" and not chroma_client.warmed_up:
+        status = "starting"
+    else:
+        status = "ready"
+
+    response = ReadinessResponse(
+        status=status,
+        startup_mode=CHROMA_STARTUP_MODE,
+        model_loaded=chroma_client.loaded,
+        warmed_up=chroma_client.warmed_up,
+        error=chroma_client.init_error,
+        startup_timings=chroma_client.startup_timings,
+    )
+    if status != "ready":
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
+
+
 @app.get("/stats", response_model=StatsResponse)
 async def get_stats():
-    """Get system statistics"""
+    """Get system statistics from the incrementally maintained counters"""
+    client = await chroma_client.acquire()
     try:
-        total_questions = chroma_client.get_collection_stats()
-
-        # This would require more advanced queries in a real scenario
-        subjects_count = {
-            "General Intelligence and Reasoning": 0,
-            "Quantitative Aptitude": 0,
-            "English Comprehension": 0,
-            "General Awareness": 0,
-        }
-
+        aggregates = client.aggregates
         return StatsResponse(
-            total_questions=total_questions,
-            subjects_count=subjects_count,
+            total_questions=len(aggregates),
+            subjects_count=aggregates.counts("subject"),
+            years_count=aggregates.counts("year"),
+            paper_types_count=aggregates.counts("paper_type"),
             recent_processing={},
             vector_db_status="connected",
         )
@@ -372,6 +1143,26 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+async def get_cache_stats():
+    """Get query embedding and search result cache statistics"""
+    client = await chroma_client.acquire()
+    try:
+        return CacheStatsResponse(
+            collection_version=client.version,
+            query_embeddings=client.query_cache.stats(),
+            search_results=client.result_cache.stats(),
+            embedding_worker=embedding_worker.stats(),
+            embedding_store=client.embedding_store.stats() if client.embedding_store else None,
+            vector_index=client.numpy_index.stats() if client.numpy_index else None,
+            lexical_index=client.lexical_index.stats() if client.lexical_index else None,
+            duplicate_index=client.duplicate_index.stats() if client.duplicate_index else None,
+            neighbor_table=client.neighbor_table.stats() if client.neighbor_table else None,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/jobs/{job_id}", response_model=ProcessResponse)
 async def get_job_status(job_id: str):
     """Get processing job status"""
@@ -385,78 +1176,135 @@ async def get_job_status(job_id: str):
         message=job_info["message"],
         questions_processed=job_info.get("questions_processed"),
         namespace=job_info.get("namespace", "ssc-questions"),
+        pages_processed=job_info.get("pages_processed"),
+        questions_parsed=job_info.get("questions_parsed"),
+        questions_inserted=job_info.get("questions_inserted"),
+        questions_updated=job_info.get("questions_updated"),
+        questions_skipped=job_info.get("questions_skipped"),
+        questions_failed=job_info.get("questions_failed"),
+        questions_removed=job_info.get("questions_removed"),
+        sha256=job_info.get("sha256"),
+        phase=job_info.get("phase"),
+        progress=job_info.get("progress"),
+        questions_scanned=job_info.get("questions_scanned"),
+        pairs_found=job_info.get("pairs_found"),
+        clusters_found=job_info.get("clusters_found"),
+        duplicate_questions=job_info.get("duplicate_questions"),
+        questions_merged=job_info.get("questions_merged"),
+        clusters=job_info.get("clusters"),
     )
 
 
 # Background task functions
+async def refresh_neighbor_table():
+    """Bring the related-questions table up to date after an ingest; failures only log"""
+    try:
+        client = await chroma_client.acquire()
+        refreshed = await run_in_threadpool(client.refresh_neighbors)
+        if refreshed:
+            logger.info(f"Refreshed neighbour lists for {refreshed} questions")
+    except Exception as e:
+        logger.warning(f"Neighbour table refresh failed: {e}")
+
+
+def ingest_summary(job_info: dict) -> str:
+    """Completion message for an ingest job from its progress counters"""
+    return (
+        f"Successfully processed {job_info.get('questions_parsed', 0)} questions: "
+        f"{job_info.get('questions_inserted', 0)} inserted, {job_info.get('questions_updated', 0)} updated, "
+        f"{job_info.get('questions_skipped', 0)} unchanged, {job_info.get('questions_removed', 0)} removed, "
+        f"{job_info.get('questions_failed', 0)} failed"
+    )
+
+
 async def process_s3_file_background(job_id: str, bucket: str, key: str, namespace: str):
     """Background task to process S3 file"""
+    file_path = None
     try:
         # Download from S3
-        file_path = s3_client.download_file(bucket, key)
-
-        # Process and upload to ChromaDB
-        questions_processed = question_processor.process_and_upload(file_path, namespace)
+        file_path = await run_in_threadpool(s3_client.download_file, bucket, key)
+
+        # Process and upload to ChromaDB, publishing progress on the job record
+        questions_processed = await run_in_threadpool(
+            question_processor.process_and_upload,
+            file_path,
+            namespace,
+            processing_jobs[job_id].update,
+            f"s3://{bucket}/{key}",
+        )
 
         processing_jobs[job_id].update(
             {
                 "status": "completed",
-                "message": f"Successfully processed {questions_processed} questions",
+                "message": ingest_summary(processing_jobs[job_id]),
                 "questions_processed": questions_processed,
                 "completed_at": datetime.now(),
                 "namespace": namespace,
             }
         )
-
-        # Cleanup temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        await refresh_neighbor_table()
 
     except Exception as e:
         processing_jobs[job_id].update(
             {"status": "failed", "message": f"Processing failed: {str(e)}", "completed_at": datetime.now()}
         )
+    finally:
+        # Cleanup temporary file
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
 
 
 async def process_file_background(job_id: str, file_path: str, namespace: str):
     """Background task to process uploaded file"""
     try:
-        questions_processed = question_processor.process_and_upload(file_path, namespace)
+        # The uploaded filename names the paper (the temp path is random), so uploading a
+        # corrected version of the same file replaces its questions
+        questions_processed = await run_in_threadpool(
+            question_processor.process_and_upload,
+            file_path,
+            namespace,
+            processing_jobs[job_id].update,
+            processing_jobs[job_id]["filename"],
+        )
 
         processing_jobs[job_id].update(
             {
                 "status": "completed",
-                "message": f"Successfully processed {questions_processed} questions",
+                "message": ingest_summary(processing_jobs[job_id]),
                 "questions_processed": questions_processed,
                 "completed_at": datetime.now(),
                 "namespace": namespace,
             }
         )
-
-        # Cleanup temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        await refresh_neighbor_table()
 
     except Exception as e:
         processing_jobs[job_id].update(
             {"status": "failed", "message": f"Processing failed: {str(e)}", "completed_at": datetime.now()}
         )
+    finally:
+        # Cleanup temporary file
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
 
-async def process_text_background(job_id: str, text_content: str, namespace: str):
+async def process_text_background(job_id: str, text_content: str, namespace: str, source: Optional[str] = None):
     """Background task to process text content"""
     try:
-        questions_processed = question_processor.process_text_content(text_content, namespace)
+        questions_processed = await run_in_threadpool(
+            question_processor.process_text_and_upload, text_content, namespace, processing_jobs[job_id].update, source
+        )
 
         processing_jobs[job_id].update(
             {
                 "status": "completed",
-                "message": f"Successfully processed {questions_processed} questions",
+                "message": ingest_summary(processing_jobs[job_id]),
                 "questions_processed": questions_processed,
                 "completed_at": datetime.now(),
                 "namespace": namespace,
             }
         )
+        await refresh_neighbor_table()
 
     except Exception as e:
         processing_jobs[job_id].update(
@@ -464,6 +1312,43 @@ async def process_text_background(job_id: str, text_content: str, namespace: str
         )
 
 
+async def dedupe_background(job_id: str, request: DedupeRequest):
+    """Background task for the near-duplicate scan"""
+    try:
+        clusters = await run_in_threadpool(
+            find_duplicate_clusters,
+            chroma_client,
+            request.threshold,
+            request.same_subject,
+            processing_jobs[job_id].update,
+        )
+        merged = 0
+        if request.mode == "merge":
+            merged = await run_in_threadpool(merge_clusters, chroma_client, clusters, processing_jobs[job_id].update)
+
+        job_info = processing_jobs[job_id]
+        message = (
+            f"Found {len(clusters)} clusters covering {job_info.get('duplicate_questions', 0)} duplicate questions"
+        )
+        if request.mode == "merge":
+            message += f"; merged {merged} into their canonical questions"
+        job_info.update(
+            {
+                "status": "completed",
+                "message": message,
+                "phase": "completed",
+                "progress": 1.0,
+                "clusters": clusters[: request.max_clusters],
+                "completed_at": datetime.now(),
+            }
+        )
+
+    except Exception as e:
+        processing_jobs[job_id].update(
+            {"status": "failed", "message": f"Dedupe failed: {str(e)}", "completed_at": datetime.now()}
+        )
+
+
 if __name__ == "__main__":
     import uvicorn
 
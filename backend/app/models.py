@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -12,6 +12,9 @@ class QueryRequest(BaseModel):
     question: str = Field(..., description="The question or topic to search for")
     top_k: int = Field(5, ge=1, le=50, description="Number of similar questions to return")
     subject: Optional[str] = Field(None, description="Filter by subject")
+    search_mode: Literal["vector", "hybrid", "lexical"] = Field(
+        "vector", description="vector (embeddings), lexical (BM25 keywords) or hybrid (both, rank-fused)"
+    )
 
 
 class MatchResponse(BaseModel):
@@ -35,6 +38,20 @@ class QueryResponse(BaseModel):
     search_time: Optional[float] = Field(None, description="Time taken for search in seconds")
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for running several queries in one call"""
+
+    queries: List[QueryRequest] = Field(..., min_length=1, max_length=100, description="Queries to run")
+
+
+class BatchQueryResponse(BaseModel):
+    """Response model for batch query results"""
+
+    results: List[QueryResponse] = Field(..., description="Results for each query, in request order")
+    total_queries: int = Field(..., ge=0, description="Number of queries answered")
+    search_time: Optional[float] = Field(None, description="Time taken for the whole batch in seconds")
+
+
 class ProcessS3Request(BaseModel):
     """Request model for processing S3 files"""
 
@@ -55,6 +72,37 @@ class ProcessTextRequest(BaseModel):
 
     text_content: str = Field(..., description="Text content to process")
     namespace: str = Field("ssc-questions", description="Namespace for vector storage")
+    source: Optional[str] = Field(
+        None, description="Name of the paper; processing the same source again replaces its questions"
+    )
+
+
+class DedupeRequest(BaseModel):
+    """Request model for a corpus-wide near-duplicate scan"""
+
+    threshold: float = Field(
+        0.9, ge=0, le=1, description="Minimum similarity (same scale as similarity_score) for two questions to match"
+    )
+    mode: Literal["report", "merge"] = Field(
+        "report", description="report clusters only, or merge each cluster into its canonical question"
+    )
+    same_subject: bool = Field(True, description="Only compare questions within the same subject")
+    max_clusters: int = Field(100, ge=0, le=10000, description="Clusters included in the job status")
+
+
+class DuplicateCluster(BaseModel):
+    """A group of near-duplicate questions"""
+
+    canonical_id: str = Field(..., description="Question kept when the cluster is merged")
+    question_ids: List[str] = Field(..., description="All questions in the cluster, canonical first")
+    held_ids: List[str] = Field(
+        default_factory=list,
+        description="Members not merged: below the threshold against the canonical question or with different numbers",
+    )
+    subject: str = Field("", description="Subject of the canonical question")
+    text: str = Field("", description="Text of the canonical question")
+    max_similarity: float = Field(..., description="Highest similarity between linked questions")
+    min_similarity: float = Field(..., description="Lowest similarity between linked questions")
 
 
 class ProcessResponse(BaseModel):
@@ -65,6 +113,24 @@ class ProcessResponse(BaseModel):
     message: str = Field(..., description="Status message")
     questions_processed: Optional[int] = Field(None, description="Number of questions processed")
     namespace: str = Field(..., description="Namespace where questions were stored")
+    pages_processed: Optional[int] = Field(None, description="PDF pages extracted so far")
+    questions_parsed: Optional[int] = Field(None, description="Questions parsed so far")
+    questions_inserted: Optional[int] = Field(None, description="New questions stored")
+    questions_updated: Optional[int] = Field(None, description="Existing questions whose content changed")
+    questions_skipped: Optional[int] = Field(None, description="Questions already stored unchanged")
+    questions_failed: Optional[int] = Field(None, description="Questions that could not be stored")
+    questions_removed: Optional[int] = Field(
+        None, description="Questions of a re-ingested source that its new version no longer contains"
+    )
+    sha256: Optional[str] = Field(None, description="SHA-256 of the uploaded file")
+    phase: Optional[str] = Field(None, description="Current phase of a multi-step job")
+    progress: Optional[float] = Field(None, description="Fraction of the job done (0-1)")
+    questions_scanned: Optional[int] = Field(None, description="Questions read by a dedupe job")
+    pairs_found: Optional[int] = Field(None, description="Near-duplicate pairs found so far")
+    clusters_found: Optional[int] = Field(None, description="Near-duplicate clusters found")
+    duplicate_questions: Optional[int] = Field(None, description="Questions that duplicate a canonical one")
+    questions_merged: Optional[int] = Field(None, description="Duplicate questions removed by merging")
+    clusters: Optional[List[DuplicateCluster]] = Field(None, description="Largest near-duplicate clusters")
 
 
 class QuestionCreate(BaseModel):
@@ -119,6 +185,35 @@ class BatchQuestionsResponse(BaseModel):
     errors: List[str] = Field(default_factory=list, description="Error messages")
 
 
+class QuestionBulkUpdate(QuestionUpdate):
+    """One bulk update entry: the question id and the fields to change"""
+
+    id: str = Field(..., description="Question identifier")
+
+
+class BulkUpdateRequest(BaseModel):
+    """Request model for updating many questions"""
+
+    updates: List[QuestionBulkUpdate] = Field(..., min_length=1, description="Field changes per question")
+
+
+class BulkDeleteRequest(BaseModel):
+    """Request model for deleting many questions"""
+
+    ids: List[str] = Field(..., min_length=1, description="Question identifiers to delete")
+
+
+class BulkOperationResponse(BaseModel):
+    """Response model for bulk update/delete operations"""
+
+    processed: int = Field(..., description="Number of questions updated or deleted")
+    reembedded: int = Field(0, description="Updated questions whose text or options changed")
+    unchanged: int = Field(0, description="Questions the update left as they were")
+    not_found: List[str] = Field(default_factory=list, description="Ids with no stored question")
+    failed: int = Field(0, description="Number of questions that failed")
+    errors: List[str] = Field(default_factory=list, description="Error messages")
+
+
 class ParsedQuestion(BaseModel):
     """Schema for a single parsed question returned by the parser endpoint."""
 
@@ -147,10 +242,22 @@ class HealthResponse(BaseModel):
     database_status: Optional[str] = Field(None, description="Database connection status")
 
 
+class ReadinessResponse(BaseModel):
+    """Readiness probe response"""
+
+    status: str = Field(..., description="'ready', 'starting' or 'failed'")
+    startup_mode: str = Field(..., description="Chroma client startup mode: 'lazy' or 'eager'")
+    model_loaded: bool = Field(..., description="Whether the embedding model and Chroma client are loaded")
+    warmed_up: bool = Field(..., description="Whether the warm-up encode has completed")
+    error: Optional[str] = Field(None, description="Initialization error, if any")
+    startup_timings: Dict[str, float] = Field(default_factory=dict, description="Startup phase durations in seconds")
+
+
 class SubjectsResponse(BaseModel):
     """Available subjects response"""
 
     subjects: List[str] = Field(..., description="List of available subjects")
+    counts: Dict[str, int] = Field(default_factory=dict, description="Stored questions per subject")
 
 
 class StatsResponse(BaseModel):
@@ -158,10 +265,26 @@ class StatsResponse(BaseModel):
 
     total_questions: int = Field(..., description="Total number of questions")
     subjects_count: Dict[str, int] = Field(..., description="Count by subject")
+    years_count: Dict[str, int] = Field(default_factory=dict, description="Count by exam year")
+    paper_types_count: Dict[str, int] = Field(default_factory=dict, description="Count by paper type")
     recent_processing: Dict[str, Any] = Field(..., description="Recent processing stats")
     vector_db_status: str = Field(..., description="Vector database status")
 
 
+class CacheStatsResponse(BaseModel):
+    """Query embedding and search result cache statistics"""
+
+    collection_version: int = Field(..., description="Write counter used to invalidate cached results")
+    query_embeddings: Dict[str, Any] = Field(..., description="Query embedding cache stats")
+    search_results: Dict[str, Any] = Field(..., description="Search result cache stats")
+    embedding_worker: Dict[str, Any] = Field(..., description="Embedding micro-batching stats")
+    embedding_store: Optional[Dict[str, Any]] = Field(None, description="Persistent document embedding store stats")
+    vector_index: Optional[Dict[str, Any]] = Field(None, description="NumPy vector engine stats (VECTOR_ENGINE=numpy)")
+    lexical_index: Optional[Dict[str, Any]] = Field(None, description="BM25 index stats (hybrid/lexical search)")
+    duplicate_index: Optional[Dict[str, Any]] = Field(None, description="Exact/near-duplicate fast path stats")
+    neighbor_table: Optional[Dict[str, Any]] = Field(None, description="Related-questions table stats")
+
+
 class ErrorResponse(BaseModel):
     """Error response model"""
 
@@ -186,6 +309,9 @@ class AdvancedQueryRequest(BaseModel):
     question: str = Field(..., description="The question or topic to search for")
     top_k: int = Field(5, ge=1, le=50, description="Number of similar questions to return")
     filters: Optional[SearchFilters] = Field(None, description="Search filters")
+    search_mode: Literal["vector", "hybrid", "lexical"] = Field(
+        "vector", description="vector (embeddings), lexical (BM25 keywords) or hybrid (both, rank-fused)"
+    )
 
 
 # Internal Data Models (for database operations)
@@ -243,6 +369,7 @@ class PaginationParams(BaseModel):
 
     page: int = Field(1, ge=1, description="Page number")
     page_size: int = Field(10, ge=1, le=100, description="Page size")
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page; takes precedence over page")
 
 
 class PaginatedResponse(BaseModel):
@@ -253,6 +380,13 @@ class PaginatedResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
+
+
+class QuestionPage(PaginatedResponse):
+    """A page of stored questions"""
+
+    items: List[QuestionResponse]
 
 
 class SuccessResponse(BaseModel):
@@ -268,18 +402,28 @@ __all__ = [
     "QueryRequest",
     "MatchResponse",
     "QueryResponse",
+    "BatchQueryRequest",
+    "BatchQueryResponse",
     "ProcessS3Request",
     "ProcessFileRequest",
     "ProcessTextRequest",
+    "DedupeRequest",
+    "DuplicateCluster",
     "ProcessResponse",
     "QuestionCreate",
     "QuestionUpdate",
     "QuestionResponse",
     "BatchQuestionsRequest",
     "BatchQuestionsResponse",
+    "QuestionBulkUpdate",
+    "BulkUpdateRequest",
+    "BulkDeleteRequest",
+    "BulkOperationResponse",
     "HealthResponse",
+    "ReadinessResponse",
     "SubjectsResponse",
     "StatsResponse",
+    "CacheStatsResponse",
     "ErrorResponse",
     "SearchFilters",
     "AdvancedQueryRequest",
@@ -288,5 +432,6 @@ __all__ = [
     "VectorSearchResult",
     "PaginationParams",
     "PaginatedResponse",
+    "QuestionPage",
     "SuccessResponse",
 ]
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# (question id, similarity, subject)
+Neighbor = Tuple[str, float, str]
+
+
+class NeighborTable:
+    """Persisted k-nearest-neighbour lists for "more like this" lookups.
+
+    Each question's top-k neighbours (excluding itself) are stored in SQLite as a JSON
+    list of [id, similarity, subject]. As an index listener the table only marks
+    written questions as pending; refresh() computes their lists in batches after an
+    ingest and merges each new question into the lists of its neighbours, so existing
+    rows pick up better matches without a rebuild. Rows are also filled on demand by
+    the first lookup of a question. Removed questions drop their own row; stale ids in
+    other rows are skipped when the lists are read.
+    """
+
+    def __init__(self, path: str, k: int = 20, refresh_batch_size: int = 256):
+        self.k = k
+        self.refresh_batch_size = refresh_batch_size
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS neighbors (id TEXT PRIMARY KEY, neighbors TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS pending (id TEXT PRIMARY KEY, subject TEXT NOT NULL)")
+        self._db.commit()
+
+    def add(self, ids: Sequence[str], embeddings, metadatas) -> None:
+        """Index listener hook: the questions' own lists are recomputed on the next refresh"""
+        with self._lock:
+            self._db.executemany("DELETE FROM neighbors WHERE id = ?", [(id_,) for id_ in ids])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pending (id, subject) VALUES (?, ?)",
+                [(id_, metadata.get("subject", "")) for id_, metadata in zip(ids, metadatas)],
+            )
+            self._db.commit()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        rows = [(id_,) for id_ in ids]
+        with self._lock:
+            self._db.executemany("DELETE FROM neighbors WHERE id = ?", rows)
+            self._db.executemany("DELETE FROM pending WHERE id = ?", rows)
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM neighbors")
+            self._db.execute("DELETE FROM pending")
+            self._db.commit()
+
+    def get(self, question_id: str) -> Optional[List[Neighbor]]:
+        with self._lock:
+            row = self._db.execute("SELECT neighbors FROM neighbors WHERE id = ?", (question_id,)).fetchone()
+        return [tuple(neighbor) for neighbor in json.loads(row[0])] if row else None
+
+    def put(self, question_id: str, neighbors: List[Neighbor]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO neighbors (id, neighbors) VALUES (?, ?)",
+                (question_id, json.dumps(neighbors[: self.k])),
+            )
+            self._db.commit()
+
+    def refresh(
+        self,
+        nearest: Callable[[List[List[float]], int], List[List[Neighbor]]],
+        stored_embeddings: Callable[[List[str]], Dict[str, List[float]]],
+    ) -> int:
+        """Compute the lists of pending questions; returns how many were refreshed.
+
+        `nearest(embeddings, n)` returns the n nearest questions for each embedding and
+        `stored_embeddings(ids)` the stored vectors of the ids that still exist.
+        """
+        refreshed = 0
+        with self._refresh_lock:
+            while True:
+                with self._lock:
+                    subjects = dict(
+                        self._db.execute("SELECT id, subject FROM pending LIMIT ?", (self.refresh_batch_size,))
+                    )
+                ids = list(subjects)
+                if not ids:
+                    return refreshed
+
+                embeddings = stored_embeddings(ids)
+                found = [id_ for id_ in ids if id_ in embeddings]
+                results = nearest([embeddings[id_] for id_ in found], self.k + 1) if found else []
+
+                with self._lock:
+                    for id_, neighbors in zip(found, results):
+                        neighbors = [neighbor for neighbor in neighbors if neighbor[0] != id_][: self.k]
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO neighbors (id, neighbors) VALUES (?, ?)",
+                            (id_, json.dumps(neighbors)),
+                        )
+                    self._merge_reverse(found, results, subjects)
+                    self._db.executemany("DELETE FROM pending WHERE id = ?", [(id_,) for id_ in ids])
+                    self._db.commit()
+                refreshed += len(found)
+
+    def _merge_reverse(self, ids: List[str], results: List[List[Neighbor]], subjects: Dict[str, str]) -> None:
+        """Offer each refreshed question to the stored lists of its own neighbours.
+
+        Similarity is symmetric, so a new question belongs in a neighbour's list when it
+        beats that list's last entry. Only the new question's neighbours are checked,
+        which catches nearly all rows a new question should enter.
+        """
+        offers: Dict[str, List[Tuple[str, float]]] = {}
+        for id_, neighbors in zip(ids, results):
+            for neighbor_id, similarity, _ in neighbors:
+                if neighbor_id != id_:
+                    offers.setdefault(neighbor_id, []).append((id_, similarity))
+
+        for neighbor_id, offered in offers.items():
+            row = self._db.execute("SELECT neighbors FROM neighbors WHERE id = ?", (neighbor_id,)).fetchone()
+            if row is None:
+                continue
+            current = {entry[0]: entry for entry in json.loads(row[0])}
+            for id_, similarity in offered:
+                current[id_] = [id_, similarity, subjects.get(id_, "")]
+            merged = sorted(current.values(), key=lambda entry: -entry[1])[: self.k]
+            self._db.execute("UPDATE neighbors SET neighbors = ? WHERE id = ?", (json.dumps(merged), neighbor_id))
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM neighbors").fetchone()[0]
+            pending = self._db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+        return {"questions": rows, "pending": pending, "k": self.k}
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional
+
+
+def _count_pages(file_path: str) -> int:
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(file_path).pages)
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) (0-based). Runs inside pool workers."""
+    import pdfplumber
+
+    texts = []
+    with pdfplumber.open(file_path, pages=list(range(start + 1, end + 1))) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.flush_cache()
+    return texts
+
+
+def _iter_pages_serial(file_path: str) -> Iterator[str]:
+    try:
+        import pdfplumber
+    except ImportError:
+        pdfplumber = None
+
+    if pdfplumber is not None:
+        with pdfplumber.open(file_path) as pdf:
+            for page in pdf.pages:
+                text = page.extract_text() or ""
+                # Drop the parsed layout objects pdfplumber caches on each page
+                page.flush_cache()
+                yield text
+        return
+
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(file_path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def _iter_pages_parallel(file_path: str, page_count: int, workers: int, pages_per_task: int) -> Iterator[str]:
+    ranges = iter([(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)])
+
+    # Spawned workers only import this module, not the model or the web app
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        # Keep a bounded number of ranges in flight and hand them back in page order
+        pending = deque(pool.submit(_extract_page_range, file_path, *r) for r in islice(ranges, workers * 2))
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(pool.submit(_extract_page_range, file_path, *next_range))
+            yield from texts
+
+
+def iter_pdf_pages(file_path: str, workers: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each PDF page in order, one page at a time.
+
+    Large files are split into page ranges (PDF_PAGES_PER_TASK) extracted by a process
+    pool of PDF_EXTRACT_WORKERS workers; results are still yielded in page order.
+    Files shorter than PDF_PARALLEL_MIN_PAGES, single-worker setups and installs
+    without pdfplumber use serial extraction, where pool startup would cost more than
+    it saves. Serial mode falls back to PyPDF2 when pdfplumber is unavailable.
+    """
+    if workers is None:
+        workers = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+    min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 20))
+    pages_per_task = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+
+    if workers > 1:
+        try:
+            import pdfplumber  # noqa: F401
+
+            page_count = _count_pages(file_path)
+        except Exception:
+            page_count = 0
+
+        if page_count >= min_pages:
+            workers = min(workers, -(-page_count // pages_per_task))
+            yield from _iter_pages_parallel(file_path, page_count, workers, pages_per_task)
+            return
+
+    yield from _iter_pages_serial(file_path)
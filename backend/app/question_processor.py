@@ -1,12 +1,67 @@
+import bisect
 import hashlib
+import multiprocessing
 import os
 import re
-from typing import Dict, List, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .pdf_extractor import iter_pdf_pages
+
+# Patterns are compiled once at import; the parser runs them on every input line
+QUESTION_NUMBER_PATTERN = re.compile(r"^Q\.?\s*\d+", re.IGNORECASE)
+OPTION_PATTERN = re.compile(r"^\(?\s*([1-4A-D])\s*[\.\)]\s*(.+)$", re.IGNORECASE)
+ANSWER_PATTERN = re.compile(r"(?:Ans(?:wer)?|Answer)\s*:?[\s\(]*([1-4A-D])[\)]?", re.IGNORECASE)
+QUESTION_TEXT_PATTERN = re.compile(r"(?:Q\.?\s*)?(?:\d+\.?\s*)?(.*\?)?")
+QUESTION_PREFIX_PATTERN = re.compile(r"^(?:Q\.?\s*)?(?:\d+\.?\s*)?")
+SECTION_PATTERN = re.compile(r"Section\s*:?\s*([\w\s]+?)(?:\n|$)", re.IGNORECASE)
+# Header lines ("Section : ...") set the subject and are dropped from question blocks
+SECTION_HEADER_PATTERN = re.compile(r"^Section\s*:", re.IGNORECASE)
+SECTION_HEADER_LINE_PATTERN = re.compile(r"^Section[^\S\n]*:[^\n]*", re.IGNORECASE | re.MULTILINE)
+
+
+def _iter_lines(text: str, slice_size: int = 1 << 20) -> Iterator[str]:
+    """Same lines as text.splitlines(), split from ~1 MB slices so no full line list is built"""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + slice_size)
+        end = len(text) if end == -1 else end + 1
+        yield from text[start:end].splitlines()
+        start = end
+
+
+def _section_of(header_line: str) -> Optional[str]:
+    section_match = SECTION_PATTERN.search(header_line)
+    return section_match.group(1).strip() if section_match else None
+
+
+def _parse_shard(shard: str, section: Optional[str]) -> List[Dict]:
+    """Parse one shard of a document in a pool worker"""
+    return list(QuestionProcessor()._parse_lines(_iter_lines(shard), section))
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class QuestionProcessor:
-    def __init__(self):
-        self.current_section = None
+    def __init__(self, chroma_client=None):
+        # Vector store used by process_and_upload / process_text_and_upload
+        self.chroma_client = chroma_client
+        self.ingest_chunk_size = int(os.getenv("INGEST_CHUNK_SIZE", 100))
+        # Sharded parsing for large texts (PARSE_WORKERS=1 disables it)
+        self.parse_workers = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+        self.parallel_min_chars = int(os.getenv("PARSE_PARALLEL_MIN_CHARS", 1_000_000))
+        self.shard_min_chars = int(os.getenv("PARSE_SHARD_MIN_CHARS", 256 * 1024))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
         # Enable debug when SSC_DEBUG env var is truthy (1/true/yes)
         self.debug = str(os.getenv("SSC_DEBUG", "")).lower() in ("1", "true", "yes")
 
@@ -17,118 +72,170 @@ class QuestionProcessor:
     def _generate_question_id(self, text: str) -> str:
         return f"q_{hashlib.md5(text.encode()).hexdigest()[:8]}"
 
+    @staticmethod
+    def _question_key(text: str) -> str:
+        """The question stem, case- and whitespace-insensitive"""
+        return " ".join(text.lower().split())
+
+    @staticmethod
+    def _block_key(text: str, options: Iterable[str]) -> str:
+        """The stem and options, case- and whitespace-insensitive"""
+        return "\n".join(QuestionProcessor._question_key(part) for part in [text, *options])
+
     def _is_question_start(self, line: str) -> bool:
         """Heuristic to decide whether a line starts a new question.
 
         We treat a line as a question start if:
         - it begins with 'Q' (e.g. 'Q.1', 'Q1.'), or
-        - it begins with a number and contains a question mark, or
-        - it contains a question mark anywhere (fallback).
+        - it contains a question mark anywhere (which covers '12. ...?').
         This avoids treating option lines like '1. 3' or '(A) London' as new questions.
         """
         s = line.strip()
-        if not s:
-            return False
-        if re.match(r"^Q\.?\s*\d+", s, re.IGNORECASE):
-            return True
-        if re.match(r"^\d+\.", s) and "?" in s:
-            return True
-        if "?" in s:
-            return True
-        return False
-
-    def _split_into_question_blocks(self, text: str) -> List[str]:
-        # Detect and store section (multi-word allowed)
-        section_match = re.search(r'Section\s*:?\s*([\w\s]+?)(?:\n|$)', text, re.IGNORECASE)
-        if section_match:
-            self.current_section = section_match.group(1).strip()
-            self._log(f"Processing section: {self.current_section}")
-
-        # Remove leading section line(s)
-        text = re.sub(r'^Section\s*:.*?\n', '', text, flags=re.IGNORECASE | re.MULTILINE)
-
-        # Build blocks by scanning lines and grouping until next question start
-        lines = [line.rstrip() for line in text.splitlines()]
-        blocks: List[str] = []
-        current_block_lines: List[str] = []
-
-        for i, line in enumerate(lines):
-            # skip empty lines but preserve as separator
-            if not line.strip():
+        return bool(s) and ("?" in s or QUESTION_NUMBER_PATTERN.match(s) is not None)
+
+    def _finish_block(self, lines: List[str], options: List[str], answer: Optional[str], subject: str):
+        """Build the parsed dict for a completed block, or None if it is not a question"""
+        if not options:
+            return None
+
+        first_line = lines[0]
+        q_text_match = QUESTION_TEXT_PATTERN.match(first_line)
+        if q_text_match.group(1):
+            question_text = q_text_match.group(1).strip()
+        else:
+            question_text = QUESTION_PREFIX_PATTERN.sub("", first_line, count=1).strip()
+        if not question_text:
+            return None
+
+        if self.debug:
+            self._log(f"Question text: {question_text}")
+
+        return {
+            # Keyed on the stem and options, so papers sharing a stem ("Find the odd one
+            # out") keep distinct ids while a corrected answer keeps the question's id;
+            # _keyed scopes it by occurrence and source
+            "question_id": self._generate_question_id(self._block_key(question_text, options)),
+            "text": question_text,
+            "options": options,
+            "correct_answer": answer,
+            "subject": subject,
+        }
+
+    def _parse_lines(self, lines: Iterable[str], section: Optional[str] = None) -> Iterator[Dict]:
+        """Single-pass line classifier and parser.
+
+        Each line is tagged once as a section header, question start, or continuation
+        (option and/or answer line); blocks and their parsed dicts are built as the
+        lines stream past. A block runs until the next question start; lines before
+        the first question start open an orphan block. Options are continuation lines
+        matching the option pattern and the answer is the last line with an answer
+        marker. Section headers set the subject of the blocks that start after them;
+        `section` is the subject in effect before the first header.
+
+        All parsing state is local, so one processor can serve concurrent requests.
+        """
+        block: Optional[List[str]] = None
+        options: List[str] = []
+        answer: Optional[str] = None
+        block_subject = section
+
+        for raw_line in lines:
+            line = raw_line.strip()
+            if not line:
                 continue
 
-            if self._is_question_start(line):
-                # start a new block
-                if current_block_lines:
-                    blocks.append("\n".join(current_block_lines).strip())
-                current_block_lines = [line.strip()]
-            else:
-                # continuation (option/answer line)
-                if current_block_lines:
-                    current_block_lines.append(line.strip())
-                else:
-                    # If no current block, treat this as orphan content; start a new block
-                    current_block_lines = [line.strip()]
-
-        # append last block
-        if current_block_lines:
-            blocks.append("\n".join(current_block_lines).strip())
-
-        return blocks
-
-    def _parse_question_block(self, block: str) -> Optional[Dict]:
-        try:
-            lines = [line.strip() for line in block.split('\n') if line.strip()]
-            if not lines:
-                return None
-
-            # Extract question text from first line (remove leading Q/number prefixes)
-            q_text_match = re.match(r"(?:Q\.?\s*)?(?:\d+\.?\s*)?(.*\?)?", lines[0])
-            # Fallback: take whole first line if regex didn't capture a proper question
-            question_text = lines[0]
-            if q_text_match and q_text_match.group(1):
-                question_text = q_text_match.group(1).strip()
+            if line[0] in "Ss" and SECTION_HEADER_PATTERN.match(raw_line):
+                section = _section_of(raw_line) or section
+                self._log(f"Processing section: {section}")
+                continue
+
+            if block is None or "?" in line or QUESTION_NUMBER_PATTERN.match(line):
+                if block is not None:
+                    parsed = self._finish_block(block, options, answer, block_subject or "Unknown")
+                    if parsed:
+                        yield parsed
+                block = [line]
+                options = []
+                answer = None
+                block_subject = section
             else:
-                # if first line ends with '?', use it; otherwise strip numbering
-                question_text = re.sub(r"^(?:Q\.?\s*)?(?:\d+\.?\s*)?", "", lines[0]).strip()
+                block.append(line)
+                option_match = OPTION_PATTERN.match(line)
+                if option_match:
+                    options.append(option_match.group(2).strip())
 
-            self._log(f"Question text: {question_text}")
+            answer_match = ANSWER_PATTERN.search(line)
+            if answer_match:
+                answer = answer_match.group(1)
 
-            # Collect options: various formats like '1. text', '(1) text', '(A) text', 'A. text', '1) text'
-            options: List[str] = []
-            for line in lines[1:]:
-                # Match options: e.g. '1. text', '(1) text', 'A. text', '(A) text', '1) text'
-                opt_match = re.match(r"^\(?\s*([1-4A-D])\s*[\.\)]\s*(.+)$", line, re.IGNORECASE)
-                if opt_match:
-                    options.append(opt_match.group(2).strip())
-
-            # Find answer (look across lines)
-            answer = None
-            for line in lines[::-1]:
-                ans_match = re.search(r"(?:Ans(?:wer)?|Answer)\s*:?[\s\(]*([1-4A-D])[\)]?", line, re.IGNORECASE)
-                if ans_match:
-                    answer = ans_match.group(1)
+        if block is not None:
+            parsed = self._finish_block(block, options, answer, block_subject or "Unknown")
+            if parsed:
+                yield parsed
+
+    def _split_shards(self, text: str, shard_chars: int) -> List[Tuple[str, Optional[str]]]:
+        """Cut text into (shard, section in effect at its start) pairs.
+
+        Cuts are placed at the first question start after each `shard_chars` offset, so
+        no question block straddles two shards (header lines do not end a block, so they
+        are never cut points). Each shard carries the section of the last header before it.
+        """
+        first_section = SECTION_PATTERN.search(text)
+        initial_section = first_section.group(1).strip() if first_section else None
+        headers = [(m.start(), _section_of(m.group(0))) for m in SECTION_HEADER_LINE_PATTERN.finditer(text)]
+        headers = [(offset, name) for offset, name in headers if name]
+        header_offsets = [offset for offset, _ in headers]
+
+        cuts = [0]
+        position = shard_chars
+        while position < len(text):
+            line_start = text.find("\n", position) + 1
+            while 0 < line_start < len(text):
+                line_end = text.find("\n", line_start)
+                line = text[line_start : line_end if line_end != -1 else len(text)]
+                # splitlines() also breaks on \r, \f etc., which the parser would see as separate lines
+                if len(line.splitlines()) == 1 and self._is_question_start(line) and not SECTION_HEADER_PATTERN.match(line):
                     break
+                line_start = line_end + 1
+            if line_start <= cuts[-1] or line_start >= len(text):
+                break
+            cuts.append(line_start)
+            position = line_start + shard_chars
+        cuts.append(len(text))
 
-            if not (question_text and options):
-                self._log("Skipping block: missing question text or options")
-                return None
-
-            result = {
-                "question_id": self._generate_question_id(block),
-                "text": question_text,
-                "options": options,
-                "correct_answer": answer,
-                "subject": self.current_section or "Unknown",
-            }
-            return result
-        except Exception as e:
-            self._log(f"Error parsing block: {e}")
-            return None
+        shards = []
+        for start, end in zip(cuts, cuts[1:]):
+            header_index = bisect.bisect_left(header_offsets, start) - 1
+            section = headers[header_index][1] if header_index >= 0 else initial_section
+            shards.append((text[start:end], section))
+        return shards
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawned workers only import this module, not the model or the web app
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
 
-    def process_text_content(self, text: str) -> List[Dict]:
+    def close(self) -> None:
+        """Shut down the parsing process pool, if one was started"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def process_text_content(self, text: str, parallel: Optional[bool] = None) -> List[Dict]:
         """Process text content and extract questions.
 
+        Each question's subject is the most recent section header above it; questions
+        before the first header use the first section named in the text.
+
+        Large texts (PARSE_PARALLEL_MIN_CHARS and up, or parallel=True) are split at
+        question/section boundaries into shards that are parsed in a process pool with
+        their section context; results are merged in document order.
+
         Returns:
             List[Dict]: List of parsed questions, each containing:
                 - question_id: Unique identifier
@@ -137,18 +244,186 @@ class QuestionProcessor:
                 - correct_answer: The correct answer
                 - subject: Question subject/section
         """
-        self.current_section = None
-        blocks = self._split_into_question_blocks(text)
-        results: List[Dict] = []
-        for block in blocks:
-            parsed = self._parse_question_block(block)
-            if parsed:
-                results.append(parsed)
+        if parallel is None:
+            parallel = len(text) >= self.parallel_min_chars
+        if parallel and self.parse_workers > 1:
+            shard_chars = max(self.shard_min_chars, len(text) // (self.parse_workers * 4))
+            shards = self._split_shards(text, shard_chars)
+            if len(shards) > 1:
+                pool = self._get_pool()
+                results = list(
+                    self._keyed(chain.from_iterable(pool.map(_parse_shard, *zip(*shards))), None, set())
+                )
+                self._log(f"Processed {len(results)} questions from {len(shards)} shards")
+                return results
+
+        results = list(self.iter_text_questions(text))
 
         self._log(f"Processed {len(results)} questions")
         return results
 
+    def iter_text_questions(self, text: str) -> Iterator[Dict]:
+        """Yield the questions of a text one at a time, in document order.
+
+        Same output as process_text_content(text, parallel=False), but nothing beyond
+        the current block is held, so callers can stream results as they are parsed.
+        """
+        first_section = SECTION_PATTERN.search(text)
+        section = first_section.group(1).strip() if first_section else None
+        return self._keyed(self._parse_lines(_iter_lines(text), section), None, set())
+
+    def iter_parsed_questions(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """Parse a stream of lines into question dicts as each block completes.
+
+        Blocks stay open across chunk (e.g. PDF page) boundaries, and each section header
+        sets the subject for the questions after it.
+        """
+        return self._parse_lines(lines)
+
+    @staticmethod
+    def to_question_data(parsed: Dict, source: Optional[str] = None) -> Dict:
+        """Convert a parsed question into the record shape ChromaClient stores"""
+        return {
+            "id": parsed["question_id"],
+            "text": parsed["text"],
+            "options": parsed["options"],
+            "correct_answer": parsed.get("correct_answer"),
+            "subject": parsed.get("subject"),
+            "year": parsed.get("year"),
+            "paper_type": parsed.get("paper_type"),
+            "full_text": f"{parsed['text']} Options: {', '.join(parsed['options'])}",
+            "metadata": {"source": source} if source else {},
+        }
+
+    def _keyed(self, parsed_questions: Iterable[Dict], source: Optional[str], ids: set) -> Iterator[Dict]:
+        """Give each question an id that is unique within its document.
+
+        With a source the id comes from the source, the question stem and how many
+        times that stem occurred before in the document, so re-ingesting the same
+        source maps each question onto its stored copy (answer or option fixes become
+        updates) while repeated stems and other papers stay distinct. Without one it
+        comes from the stem and options (see _finish_block) and, for a repeated block,
+        its occurrence. Ids are added to `ids`.
+        """
+        occurrences: Dict[str, int] = {}
+        for parsed in parsed_questions:
+            if source:
+                key = self._question_key(parsed["text"])
+            else:
+                key = self._block_key(parsed["text"], parsed["options"])
+            occurrence = occurrences[key] = occurrences.get(key, 0) + 1
+            if source or occurrence > 1:
+                parsed = {**parsed, "question_id": self._generate_question_id(f"{source or ''}\n{key}\n{occurrence}")}
+            ids.add(parsed["question_id"])
+            yield parsed
+
+    def _upload(self, parsed_questions: Iterable[Dict], namespace: str, stats: Dict, report, source=None) -> int:
+        """Upsert parsed questions in chunks of `ingest_chunk_size`, updating `stats`.
+
+        With a source, its stored questions that the new upload no longer contains
+        (e.g. ones whose stem was corrected) are deleted once every chunk is stored.
+        """
+        if self.chroma_client is None:
+            raise RuntimeError("QuestionProcessor was created without a chroma client")
+
+        ids: set = set()
+        questions = (self.to_question_data(parsed, source) for parsed in self._keyed(parsed_questions, source, ids))
+        for chunk in _chunked(questions, self.ingest_chunk_size):
+            stats["questions_parsed"] += len(chunk)
+            result = self.chroma_client.upsert_questions(chunk, namespace)
+            stats["questions_inserted"] += result["inserted"]
+            stats["questions_updated"] += result["updated"]
+            stats["questions_skipped"] += result["skipped"]
+            stats["questions_failed"] += len(result["failed"])
+            report()
+
+        if source:
+            stale = [id_ for id_ in self.chroma_client.source_question_ids(source) if id_ not in ids]
+            stats["questions_removed"] += self.chroma_client.delete_questions(stale)["deleted"] if stale else 0
+            report()
+
+        self._log(
+            f"Stored questions: {stats['questions_inserted']} inserted, "
+            f"{stats['questions_updated']} updated, {stats['questions_skipped']} unchanged, "
+            f"{stats['questions_removed']} removed"
+        )
+        return stats["questions_inserted"] + stats["questions_updated"]
+
+    @staticmethod
+    def _new_ingest_stats() -> Dict:
+        return {
+            "questions_parsed": 0,
+            "questions_inserted": 0,
+            "questions_updated": 0,
+            "questions_skipped": 0,
+            "questions_failed": 0,
+            "questions_removed": 0,
+        }
+
+    def process_and_upload(
+        self,
+        file_path: str,
+        namespace: str = "ssc-questions",
+        progress: Optional[Callable[[Dict], None]] = None,
+        source: Optional[str] = None,
+    ) -> int:
+        """Extract questions from a PDF and store them in the vector store.
+
+        Runs as a generator chain: pages are extracted one at a time, their lines are
+        stitched into question blocks across page boundaries, parsed, and upserted in
+        chunks of `ingest_chunk_size`. Memory is bounded by the chunk size, not the
+        document size. Questions already stored with the same content are skipped, so
+        re-uploading a corrected paper under the same source only re-embeds the
+        questions that changed and removes the ones it no longer contains.
+
+        Args:
+            progress: called with a stats dict (pages_processed, questions_parsed,
+                questions_inserted, questions_updated, questions_skipped,
+                questions_failed, questions_removed) after every page and chunk.
+            source: name identifying the paper (e.g. the uploaded filename); defaults
+                to the file's basename.
+
+        Returns:
+            int: Number of questions inserted or updated.
+        """
+        stats = {"pages_processed": 0, **self._new_ingest_stats()}
+
+        def report():
+            if progress is not None:
+                progress(dict(stats))
+
+        def page_lines():
+            for page_text in iter_pdf_pages(file_path):
+                yield from page_text.splitlines()
+                stats["pages_processed"] += 1
+                report()
+
+        parsed_questions = self.iter_parsed_questions(page_lines())
+        return self._upload(parsed_questions, namespace, stats, report, source or os.path.basename(file_path))
+
+    def process_text_and_upload(
+        self,
+        text: str,
+        namespace: str = "ssc-questions",
+        progress: Optional[Callable[[Dict], None]] = None,
+        source: Optional[str] = None,
+    ) -> int:
+        """Parse text content (sharded when large) and store the questions.
+
+        With a `source`, re-processing it replaces that source's questions (see _upload).
+
+        Returns:
+            int: Number of questions inserted or updated.
+        """
+        stats = self._new_ingest_stats()
+
+        def report():
+            if progress is not None:
+                progress(dict(stats))
+
+        return self._upload(self.process_text_content(text), namespace, stats, report, source)
+
 
-def create_question_processor() -> QuestionProcessor:
+def create_question_processor(chroma_client=None) -> QuestionProcessor:
     """Compatibility helper used by other modules to create a processor instance."""
-    return QuestionProcessor()
+    return QuestionProcessor(chroma_client)
@@ -0,0 +1,393 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Metadata fields with a row bitmap per distinct value, used to prefilter searches
+BITMAP_FIELDS = ("subject", "year", "paper_type")
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# Rows decoded to float32 at a time during a quantized first-pass scan
+QUANTIZED_SCAN_BLOCK = 16384
+
+
+class NumpyVectorIndex:
+    """Exact in-process vector index over a memory-mapped float32 matrix.
+
+    Vectors are L2-normalized and appended to a raw matrix file that is read through a
+    read-only memory map; a JSON-lines log next to it records the id and metadata of
+    each row and the ids deleted since. Updating an id appends a new row and tombstones
+    the old one. The log is replayed on open, and rewritten without dead rows once they
+    make up more than a quarter of the file.
+
+    Searches are a single matrix-vector product followed by `argpartition`. Filters are
+    resolved first against per-value row bitmaps (subject, year, paper_type), so only
+    matching rows are scored. Scores use the same scale as the Chroma path
+    (1 - squared L2 distance between normalized vectors), so `min_similarity`
+    thresholds mean the same thing for both engines.
+
+    Compact mode (quantization "int8" or "float16") keeps a quantized copy of the matrix
+    in memory for the first-pass scan: int8 codes with one float32 scale per row, or
+    float16 values. The best `top_k * rescore_multiplier` candidates are then rescored
+    exactly against the float32 rows in the memory-mapped file, so only those pages are
+    touched and the full-precision matrix need not stay resident.
+    """
+
+    def __init__(self, path: str, quantization: Optional[str] = None, rescore_multiplier: Optional[int] = None):
+        self.quantization = (quantization or os.getenv("NUMPY_INDEX_QUANTIZATION", "none")).lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization {self.quantization!r}; expected one of {QUANTIZATION_MODES}")
+        self.rescore_multiplier = rescore_multiplier or int(os.getenv("NUMPY_INDEX_RESCORE_MULTIPLIER", 4))
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._log_path = os.path.join(path, "rows.jsonl")
+
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self._rows = 0
+        self._mmap: Optional[np.memmap] = None
+        self._ids: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._bitmaps: Dict[str, Dict[object, np.ndarray]] = {field: {} for field in BITMAP_FIELDS}
+        # Quantized first-pass copy (compact mode): rows [0, _coded_rows) are filled
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._coded_rows = 0
+
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self._log_path):
+            return
+
+        entries = []
+        with open(self._log_path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    break
+
+        for entry in entries:
+            if "dim" in entry:
+                self.dim = entry["dim"]
+        if self.dim is None:
+            return
+
+        row_bytes = self.dim * 4
+        vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        vector_rows = vector_bytes // row_bytes
+
+        rows = []
+        for entry in entries:
+            if "delete" in entry:
+                rows.append(("delete", entry["delete"], None))
+            elif "id" in entry and entry["row"] < vector_rows:
+                rows.append(("add", entry["id"], entry["metadata"]))
+
+        added = sum(1 for kind, _, _ in rows if kind == "add")
+        self._grow(added)
+        for kind, id_, metadata in rows:
+            if kind == "delete":
+                self._tombstone(id_)
+            else:
+                self._append_row(id_, metadata)
+        # Vectors written without a log record are unreachable; cut them off so rows stay aligned
+        if vector_rows != self._rows:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(self._rows * row_bytes)
+        self._remap()
+
+        if self._rows and self.dead_rows() > self._rows // 4:
+            self._compact()
+
+    def _remap(self) -> None:
+        if self._rows:
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        else:
+            self._mmap = None
+        self._encode_new_rows()
+
+    def _encode_new_rows(self) -> None:
+        """Quantize rows appended since the last call into the in-memory first-pass copy"""
+        if self.quantization == "none" or self._coded_rows >= self._rows:
+            return
+
+        if self._codes is None or len(self._codes) < self._rows:
+            capacity = max(self._rows, 2 * (len(self._codes) if self._codes is not None else 0), 1024)
+            int8 = self.quantization == "int8"
+            codes = np.zeros((capacity, self.dim), dtype=np.int8 if int8 else np.float16)
+            scales = np.zeros(capacity, dtype=np.float32) if int8 else None
+            if self._codes is not None:
+                codes[: self._coded_rows] = self._codes[: self._coded_rows]
+                if int8:
+                    scales[: self._coded_rows] = self._scales[: self._coded_rows]
+            self._codes, self._scales = codes, scales
+
+        for start in range(self._coded_rows, self._rows, QUANTIZED_SCAN_BLOCK):
+            end = min(start + QUANTIZED_SCAN_BLOCK, self._rows)
+            block = np.asarray(self._mmap[start:end], dtype=np.float32)
+            if self.quantization == "int8":
+                # Symmetric per-row scalar quantization
+                scales = np.clip(np.abs(block).max(axis=1), 1e-12, None) / 127.0
+                self._codes[start:end] = np.rint(block / scales[:, None]).astype(np.int8)
+                self._scales[start:end] = scales
+            else:
+                self._codes[start:end] = block.astype(np.float16)
+        self._coded_rows = self._rows
+
+    def _compact(self) -> None:
+        """Rewrite the matrix and log with live rows only"""
+        live = np.flatnonzero(self._alive[: self._rows])
+        matrix = np.array(self._mmap[live]) if len(live) else np.empty((0, self.dim), dtype=np.float32)
+        ids = [self._ids[row] for row in live]
+        metadatas = [self._metadatas[row] for row in live]
+
+        with open(self._vectors_path + ".tmp", "wb") as f:
+            f.write(np.ascontiguousarray(matrix).tobytes())
+        with open(self._log_path + ".tmp", "w") as f:
+            f.write(json.dumps({"dim": self.dim}) + "\n")
+            for row, (id_, metadata) in enumerate(zip(ids, metadatas)):
+                f.write(json.dumps({"row": row, "id": id_, "metadata": metadata}) + "\n")
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._log_path + ".tmp", self._log_path)
+
+        self._reset_memory()
+        self._grow(len(ids))
+        for id_, metadata in zip(ids, metadatas):
+            self._append_row(id_, metadata)
+        self._remap()
+
+    def _reset_memory(self) -> None:
+        self._rows = 0
+        self._mmap = None
+        self._ids, self._metadatas, self._row_of = [], [], {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._bitmaps = {field: {} for field in BITMAP_FIELDS}
+        self._codes, self._scales, self._coded_rows = None, None, 0
+
+    def clear(self) -> None:
+        """Drop every row (used before a rebuild)"""
+        with self._lock:
+            for file_path in (self._vectors_path, self._log_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self.dim = None
+            self._reset_memory()
+
+    def _grow(self, extra: int) -> None:
+        """Make room for `extra` more rows in the alive flags and bitmaps (doubling capacity)"""
+        needed = self._rows + extra
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+
+        def resized(bitmap: np.ndarray) -> np.ndarray:
+            grown = np.zeros(capacity, dtype=bool)
+            grown[: len(bitmap)] = bitmap
+            return grown
+
+        self._alive = resized(self._alive)
+        for values in self._bitmaps.values():
+            for value in list(values):
+                values[value] = resized(values[value])
+
+    def _append_row(self, id_: str, metadata: Dict) -> None:
+        self._tombstone(id_)
+        row = self._rows
+        self._ids.append(id_)
+        self._metadatas.append(metadata)
+        self._row_of[id_] = row
+        self._alive[row] = True
+        for field in BITMAP_FIELDS:
+            value = metadata.get(field)
+            if value is None:
+                continue
+            bitmap = self._bitmaps[field].get(value)
+            if bitmap is None:
+                bitmap = self._bitmaps[field][value] = np.zeros(len(self._alive), dtype=bool)
+            bitmap[row] = True
+        self._rows += 1
+
+    def _tombstone(self, id_: str) -> bool:
+        row = self._row_of.pop(id_, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        return True
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]], metadatas: Sequence[Dict]) -> None:
+        """Append (or replace) rows; an id that is already indexed is tombstoned first"""
+        if not len(ids):
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.clip(norms, 1e-12, None)
+
+        with self._lock:
+            new_log = self.dim is None
+            if new_log:
+                self.dim = int(matrix.shape[1])
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(matrix).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._log_path, "a") as f:
+                if new_log:
+                    f.write(json.dumps({"dim": self.dim}) + "\n")
+                for offset, (id_, metadata) in enumerate(zip(ids, metadatas)):
+                    f.write(json.dumps({"row": self._rows + offset, "id": id_, "metadata": metadata}) + "\n")
+
+            self._grow(len(ids))
+            for id_, metadata in zip(ids, metadatas):
+                self._append_row(id_, metadata)
+            self._remap()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            removed = [id_ for id_ in ids if self._tombstone(id_)]
+            if removed:
+                with open(self._log_path, "a") as f:
+                    for id_ in removed:
+                        f.write(json.dumps({"delete": id_}) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._row_of
+
+    def dead_rows(self) -> int:
+        return self._rows - len(self._row_of)
+
+    def _candidate_mask(self, filters: Dict[str, Optional[Sequence]]) -> np.ndarray:
+        mask = self._alive[: self._rows].copy()
+        for field, values in filters.items():
+            if not values:
+                continue
+            field_mask = np.zeros(self._rows, dtype=bool)
+            for value in values:
+                bitmap = self._bitmaps[field].get(value)
+                if bitmap is not None:
+                    field_mask |= bitmap[: self._rows]
+            mask &= field_mask
+        return mask
+
+    def _first_pass_scores(
+        self, queries: np.ndarray, codes: np.ndarray, scales: Optional[np.ndarray], rows: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """Approximate scores from the quantized copy, decoding QUANTIZED_SCAN_BLOCK rows at a time"""
+        count = len(codes) if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, QUANTIZED_SCAN_BLOCK):
+            end = min(start + QUANTIZED_SCAN_BLOCK, count)
+            block_rows = slice(start, end) if rows is None else rows[start:end]
+            scores[:, start:end] = queries @ codes[block_rows].astype(np.float32).T
+            if scales is not None:
+                scores[:, start:end] *= scales[block_rows]
+        return scores
+
+    def search_many(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        top_k: int = 5,
+        subjects: Optional[Sequence[str]] = None,
+        years: Optional[Sequence[int]] = None,
+        paper_types: Optional[Sequence[str]] = None,
+        min_similarity: Optional[float] = None,
+    ) -> List[List[Dict]]:
+        """Top-k for several queries sharing the same filters, best match first.
+
+        Each hit is {"id", "metadata", "similarity"}. Exact in the default mode; in
+        compact mode the final ranking and scores are exact over the rescored candidates.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+
+        with self._lock:
+            if self._mmap is None or top_k <= 0:
+                return [[] for _ in queries]
+            matrix = self._mmap
+            ids, metadatas = self._ids, self._metadatas
+            mask = self._candidate_mask({"subject": subjects, "year": years, "paper_type": paper_types})
+            quantized = self.quantization != "none"
+            if quantized:
+                codes = self._codes[: self._rows]
+                scales = self._scales[: self._rows] if self._scales is not None else None
+
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return [[] for _ in queries]
+
+        # Mostly unfiltered: score every row and mask out the rest instead of copying rows;
+        # selective filters: gather only the matching rows before scoring
+        scan_all = len(candidates) * 2 >= len(mask)
+        scan_rows = None if scan_all else candidates
+        if quantized:
+            scores = self._first_pass_scores(queries, codes, scales, scan_rows)
+        else:
+            scores = queries @ (matrix.T if scan_all else matrix[candidates].T)
+        if scan_all and len(candidates) < len(mask):
+            scores[:, ~mask] = -np.inf
+
+        k = min(top_k, len(candidates))
+        shortlist = min(len(candidates), k * self.rescore_multiplier) if quantized else k
+        results = []
+        for query, row_scores in zip(queries, scores):
+            if shortlist < len(row_scores):
+                top = np.argpartition(-row_scores, shortlist - 1)[:shortlist]
+            else:
+                top = np.arange(len(row_scores))
+            rows = top if scan_all else candidates[top]
+            if quantized:
+                # Rescore the shortlist against full-precision rows, in file order
+                rows = np.sort(rows)
+                exact = matrix[rows] @ query
+            else:
+                exact = row_scores[top]
+            order = np.argsort(-exact, kind="stable")[:k]
+
+            hits = []
+            for position in order:
+                # Same scale as Chroma's l2 space: 1 - |q - x|^2 = 2 cos - 1 for unit vectors
+                similarity = min(1.0, max(0.0, 2.0 * float(exact[position]) - 1.0))
+                if min_similarity is not None and similarity < min_similarity:
+                    break
+                row = int(rows[position])
+                hits.append({"id": ids[row], "metadata": metadatas[row], "similarity": similarity})
+            results.append(hits)
+        return results
+
+    def search(self, query_embedding: Sequence[float], top_k: int = 5, **filters) -> List[Dict]:
+        return self.search_many([query_embedding], top_k, **filters)[0]
+
+    def first_pass_bytes(self) -> int:
+        """Bytes the first-pass scan reads per query: the float32 matrix, or the quantized copy"""
+        if self.quantization == "none":
+            return self._rows * (self.dim or 0) * 4
+        per_row = (self.dim or 0) * (1 if self.quantization == "int8" else 2)
+        return self._rows * (per_row + (4 if self.quantization == "int8" else 0))
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self),
+            "dead_rows": self.dead_rows(),
+            "dim": self.dim,
+            "quantization": self.quantization,
+            "rescore_multiplier": self.rescore_multiplier,
+            "bytes_on_disk": self._rows * (self.dim or 0) * 4,
+            "first_pass_bytes": self.first_pass_bytes(),
+            "subjects": len(self._bitmaps["subject"]),
+        }
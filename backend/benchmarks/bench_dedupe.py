@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate scan benchmark.
+
+Builds a synthetic clustered corpus (see bench_vector_engines), copies a share of its
+questions as lightly perturbed near-duplicates, then runs the dedupe job's clustering
+(blocked similarity tiles + union-find) and reports wall time, peak tile memory and
+how many planted duplicates were recovered. Run with and without --all-subjects to
+see the effect of comparing only within a subject.
+
+Run from the backend directory:
+    python -m benchmarks.bench_dedupe
+    python -m benchmarks.bench_dedupe --size 100000 --threshold 0.9
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.dedupe import DEDUPE_BLOCK_COLS, DEDUPE_BLOCK_ROWS, cluster_duplicates
+from benchmarks.bench_vector_engines import synthetic_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000, help="questions before duplicates are added")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--duplicate-share", type=float, default=0.05, help="share of questions duplicated")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--all-subjects", action="store_true", help="compare across subjects too")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors, metadatas, _ = synthetic_corpus(args.size, args.dim)
+    originals = rng.choice(args.size, int(args.size * args.duplicate_share), replace=False)
+    copies = vectors[originals] + 0.01 * rng.standard_normal((len(originals), args.dim)).astype(np.float32)
+    copies /= np.linalg.norm(copies, axis=1, keepdims=True)
+
+    vectors = np.concatenate([vectors, copies])
+    metadatas = metadatas + [
+        {**metadatas[i], "question_id": f"dup{n}", "year": 2010} for n, i in enumerate(originals.tolist())
+    ]
+    ids = [m["question_id"] for m in metadatas]
+
+    phases = {}
+    start = time.perf_counter()
+    clusters = cluster_duplicates(
+        ids,
+        vectors,
+        metadatas,
+        args.threshold,
+        same_subject=not args.all_subjects,
+        progress=lambda fields: phases.setdefault(fields.get("phase"), time.perf_counter()),
+    )
+    elapsed = time.perf_counter() - start
+
+    found = {frozenset(c["question_ids"]) for c in clusters}
+    recovered = sum(
+        any({f"q{i}", f"dup{n}"} <= cluster for cluster in found) for n, i in enumerate(originals.tolist())
+    )
+    print(
+        f"{len(ids)} questions x {args.dim} dims, threshold {args.threshold}, "
+        f"{'all subjects' if args.all_subjects else 'within subject'}"
+    )
+    print(f"tile {DEDUPE_BLOCK_ROWS}x{DEDUPE_BLOCK_COLS} = {DEDUPE_BLOCK_ROWS * DEDUPE_BLOCK_COLS * 4 / 1e6:.0f} MB")
+    print(f"clustering took {elapsed:.1f}s ({len(ids) / elapsed:,.0f} questions/s)")
+    print(
+        f"{len(clusters)} clusters, {sum(len(c['question_ids']) - 1 for c in clusters)} duplicates; "
+        f"recovered {recovered}/{len(originals)} planted duplicates"
+    )
+
+
+if __name__ == "__main__":
+    main()
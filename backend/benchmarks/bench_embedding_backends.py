@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark: sentence-transformers (PyTorch) vs int8 ONNX Runtime.
+
+Each backend runs in its own subprocess so peak RSS is measured in isolation. The
+report covers load time, texts/second and peak RSS per backend. It then checks
+parity on a fixture set of SSC-style question documents and queries: per-text
+cosine between the two backends' vectors, and top-5 neighbour overlap when the
+queries are searched against the documents. The exit status is non-zero when the
+minimum cosine falls below --min-cosine.
+
+Export the ONNX model first, then run from the backend directory:
+    python -m app.embedding_backends --output ./onnx_model
+    python -m benchmarks.bench_embedding_backends --onnx-model ./onnx_model
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+QUERIES = [
+    "What is the capital of India?",
+    "A train 150 m long crosses a pole in 15 seconds. Find its speed.",
+    "Choose the synonym of ABUNDANT",
+    "Which article of the constitution deals with the right to equality?",
+    "Find the compound interest on 10000 at 10% per annum for 2 years",
+    "The average of five numbers is 20. Find their sum.",
+    "Which river is known as the sorrow of Bihar?",
+    "Select the antonym of the word ANCIENT",
+    "If the cost price is 80 and the selling price is 100, find the profit percentage",
+    "Who is known as the father of the Indian constitution?",
+    "In a triangle, two angles are 50 and 60 degrees. Find the third angle.",
+    "Parliament of India consists of which houses?",
+]
+
+
+def fixture_documents(count: int):
+    """Question documents in the exact form ingest embeds them (text + options)"""
+    from app.question_processor import QuestionProcessor
+    from benchmarks.bench_parser import synthetic_paper
+
+    parsed = QuestionProcessor().process_text_content(synthetic_paper(count, seed=16), parallel=False)
+    return [QuestionProcessor.to_question_data(question)["full_text"] for question in parsed]
+
+
+def run_child(args):
+    """Load one backend, embed the fixtures, time it and report peak RSS as JSON"""
+    os.environ["EMBEDDING_BACKEND"] = args.child
+    if args.onnx_model:
+        os.environ["ONNX_MODEL_PATH"] = args.onnx_model
+    from app.embedding_backends import create_embedding_backend
+
+    documents = fixture_documents(args.documents)
+    start = time.perf_counter()
+    backend = create_embedding_backend()
+    load_seconds = time.perf_counter() - start
+
+    fixtures = backend.encode(QUERIES + documents, batch_size=args.batch_size)
+    np.save(args.out, fixtures)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        backend.encode(documents, batch_size=args.batch_size)
+        best = min(best, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for query in QUERIES:
+        backend.encode([query], batch_size=1)
+    single_latency = (time.perf_counter() - start) / len(QUERIES)
+
+    print(
+        json.dumps(
+            {
+                "name": backend.name,
+                "load_seconds": load_seconds,
+                "texts_per_second": len(documents) / best,
+                "single_query_ms": single_latency * 1000,
+                # ru_maxrss is in KiB on Linux
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+        )
+    )
+
+
+def top_k(queries: np.ndarray, documents: np.ndarray, k: int = 5) -> np.ndarray:
+    return np.argsort(-(queries @ documents.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-model", default="./onnx_model", help="directory written by app.embedding_backends")
+    parser.add_argument("--documents", type=int, default=500, help="fixture question documents")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per backend (best is reported)")
+    parser.add_argument("--min-cosine", type=float, default=0.95, help="fail if any fixture falls below this")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    results, vectors = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("sentence-transformers", "onnx"):
+            out = os.path.join(tmp, f"{backend}.npy")
+            command = [sys.executable, "-m", "benchmarks.bench_embedding_backends", "--child", backend, "--out", out]
+            command += ["--onnx-model", args.onnx_model, "--documents", str(args.documents)]
+            command += ["--batch-size", str(args.batch_size), "--repeat", str(args.repeat)]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                raise SystemExit(f"{backend} backend failed:\n{completed.stderr}")
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            vectors.append(np.load(out))
+
+    print(f"{'backend':>32} {'load s':>8} {'texts/s':>10} {'query ms':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(
+            f"{r['name']:>32} {r['load_seconds']:>8.2f} {r['texts_per_second']:>10,.0f} "
+            f"{r['single_query_ms']:>9.2f} {r['peak_rss_mb']:>12.0f}"
+        )
+
+    reference, candidate = vectors
+    cosines = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    n_queries = len(QUERIES)
+    reference_top = top_k(reference[:n_queries], reference[n_queries:])
+    candidate_top = top_k(candidate[:n_queries], candidate[n_queries:])
+    overlap = np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(reference_top, candidate_top)])
+
+    print(f"\nparity over {len(cosines)} fixtures: cosine mean {cosines.mean():.4f}, min {cosines.min():.4f}")
+    print(f"top-5 neighbour overlap over {n_queries} queries: {overlap:.2%}")
+    print(f"speedup {results[1]['texts_per_second'] / results[0]['texts_per_second']:.2f}x, "
+          f"RSS {results[1]['peak_rss_mb'] / results[0]['peak_rss_mb']:.2f}x")
+    if cosines.min() < args.min_cosine:
+        raise SystemExit(f"Parity check failed: min cosine {cosines.min():.4f} < {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Lexical (BM25) index benchmark.
+
+Indexes synthetic questions whose words follow a Zipf distribution over a large
+vocabulary (closer to real text than the parser benchmark's word list), then reports
+build time, the time to reopen the index from its snapshot (what startup pays
+instead of a rebuild), the postings size and p50/p95 latency for 3-6 word queries.
+
+Run from the backend directory:
+    python -m benchmarks.bench_lexical_index
+    python -m benchmarks.bench_lexical_index --size 100000 --queries 500
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.lexical_index import BM25Index
+from benchmarks.bench_parser import SECTIONS
+from benchmarks.bench_vector_engines import percentile_ms
+
+
+def synthetic_questions(size: int, vocabulary: int = 50000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+
+    def sentence(length):
+        return " ".join(words[i] for i in np.minimum(rng.zipf(1.2, length), vocabulary) - 1)
+
+    return [
+        {
+            "text": sentence(int(rng.integers(8, 25))),
+            "options": json.dumps([sentence(3) for _ in range(4)]),
+            "subject": SECTIONS[i % len(SECTIONS)],
+            "question_id": f"q{i}",
+        }
+        for i in range(size)
+    ], sentence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50000, help="questions in the index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    metadatas, sentence = synthetic_questions(args.size)
+    ids = [m["question_id"] for m in metadatas]
+    rng = np.random.default_rng(1)
+    queries = [sentence(int(rng.integers(3, 7))) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index = BM25Index(tmp, snapshot_every=10**9)
+        for i in range(0, args.size, 1000):
+            index.add(ids[i : i + 1000], None, metadatas[i : i + 1000])
+        index.close()
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = BM25Index(tmp)
+        reopen = time.perf_counter() - start
+
+        stats = index.stats()
+        snapshot_mb = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)) / 1e6
+        print(
+            f"{stats['documents']} questions, {stats['terms']} terms, {stats['postings']} postings "
+            f"({stats['postings'] * 6 / 1e6:.1f} MB of arrays), snapshot {snapshot_mb:.1f} MB on disk"
+        )
+        print(f"build {build:.2f}s, reopen from snapshot {reopen:.2f}s\n")
+
+        print(f"{'filter':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, filters in (("none", {}), ("subject", {"subjects": [SECTIONS[0]]})):
+            times = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, args.top_k, **filters)
+                times.append(time.perf_counter() - start)
+            print(f"{name:>10} {percentile_ms(times, 50):>8.2f} {percentile_ms(times, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Parser benchmark: single-pass and sharded QuestionProcessor vs the baseline implementation.
+
+Generates synthetic SSC papers and reports questions/second and peak traced memory
+for each parser, after checking that they produce the same questions. Subjects are
+left out of the baseline comparison: the baseline tags every question with the first
+section of the paper, the current parser with the section it appears under. Peak
+memory for the sharded parser covers the parent process only.
+
+Run from the backend directory:
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --sizes 1000 10000 --repeat 5 --workers 4
+"""
+
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+from app.question_processor import QuestionProcessor
+from benchmarks.legacy_parser import LegacyQuestionProcessor
+
+SECTIONS = ["General Intelligence and Reasoning", "Quantitative Aptitude", "English Comprehension", "General Awareness"]
+QUESTION_FORMATS = ["Q.{n} {text}?", "Q{n}. {text}?", "{n}. {text}?"]
+OPTION_FORMATS = ["({label}) {text}", "{label}. {text}", "{label}) {text}"]
+ANSWER_FORMATS = ["Ans: {label}", "Answer: ({label})", "Ans ({label})"]
+WORDS = (
+    "ratio proportion train speed distance profit loss synonym antonym abundant river capital "
+    "constitution article parliament interest compound simple average percentage triangle"
+).split()
+
+
+def synthetic_paper(n_questions: int, seed: int = 0) -> str:
+    """Build an SSC-style paper with section headers, wrapped question text and varied formats"""
+    rng = random.Random(seed)
+    lines = []
+    per_section = max(1, n_questions // len(SECTIONS))
+    for n in range(1, n_questions + 1):
+        if (n - 1) % per_section == 0:
+            lines.append(f"Section : {SECTIONS[((n - 1) // per_section) % len(SECTIONS)]}")
+            lines.append("")
+
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18)))
+        lines.append(rng.choice(QUESTION_FORMATS).format(n=n, text=text))
+        if rng.random() < 0.2:
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 10))))
+
+        labels = rng.choice(["ABCD", "1234"])
+        option_format = rng.choice(OPTION_FORMATS)
+        for label in labels:
+            lines.append(option_format.format(label=label, text=" ".join(rng.choice(WORDS) for _ in range(3))))
+        lines.append(rng.choice(ANSWER_FORMATS).format(label=rng.choice(labels)))
+        lines.append("")
+
+    return "\n".join(lines) + "\n"
+
+
+def comparable(questions):
+    """Parsed questions without the fields the baseline derives differently (subject, id)"""
+    return [{key: value for key, value in question.items() if key not in ("subject", "question_id")} for question in questions]
+
+
+def measure(parse, text: str, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(text)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per size (best is reported)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="sharded parser pool size")
+    args = parser.parse_args()
+
+    processor = QuestionProcessor()
+    processor.parse_workers = args.workers
+
+    print(f"{'questions':>10} {'input MB':>9} {'parser':>12} {'q/s':>12} {'seconds':>9} {'peak MB':>9} {'speedup':>8}")
+    for size in args.sizes:
+        text = synthetic_paper(size)
+        input_mb = len(text.encode()) / 1e6
+
+        legacy, legacy_time, legacy_peak = measure(LegacyQuestionProcessor().process_text_content, text, args.repeat)
+        current, current_time, current_peak = measure(
+            lambda t: processor.process_text_content(t, parallel=False), text, args.repeat
+        )
+        sharded, sharded_time, sharded_peak = measure(
+            lambda t: processor.process_text_content(t, parallel=True), text, args.repeat
+        )
+        if comparable(current) != comparable(legacy) or sharded != current:
+            raise SystemExit(f"Parsers disagree on the {size}-question paper")
+
+        for name, elapsed, peak, speedup in (
+            ("baseline", legacy_time, legacy_peak, ""),
+            ("single-pass", current_time, current_peak, f"{legacy_time / current_time:.2f}x"),
+            ("sharded", sharded_time, sharded_peak, f"{legacy_time / sharded_time:.2f}x"),
+        ):
+            print(
+                f"{size:>10} {input_mb:>9.2f} {name:>12} {len(current) / elapsed:>12,.0f} "
+                f"{elapsed:>9.3f} {peak / 1e6:>9.1f} {speedup:>8}"
+            )
+
+    processor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compact vector storage report: memory saved vs recall@k lost.
+
+Builds the NumPy vector engine in each quantization mode (none, float16, int8) over
+the same embeddings and, for every rescore candidate multiplier, reports the bytes
+the first-pass scan keeps in memory, the saving against float32, recall@k against
+the exact float32 results, the largest score difference and p50 query latency.
+
+Point --chroma-path at a Chroma persistent directory to run on the real question
+embeddings (queries are then perturbed copies of stored questions); otherwise a
+synthetic clustered corpus is used.
+
+Run from the backend directory:
+    python -m benchmarks.bench_quantization
+    python -m benchmarks.bench_quantization --chroma-path ./chroma_db --multipliers 1 2 4 8
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.vector_index import NumpyVectorIndex
+from benchmarks.bench_vector_engines import synthetic_corpus
+
+
+def load_collection(path: str, name: str = "ssc_questions", page_size: int = 1000):
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=path).get_collection(name)
+    ids, vectors, metadatas = [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids += page["ids"]
+        vectors += page["embeddings"]
+        metadatas += page["metadatas"]
+        offset += len(page["ids"])
+    return ids, np.asarray(vectors, dtype=np.float32), metadatas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chroma-path", help="use the embeddings of this Chroma persistent directory")
+    parser.add_argument("--size", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--multipliers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.chroma_path:
+        ids, vectors, metadatas = load_collection(args.chroma_path)
+        queries = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    else:
+        vectors, metadatas, queries = synthetic_corpus(args.size, 384)
+        ids = [m["question_id"] for m in metadatas]
+        queries = queries[: args.queries]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact_index = NumpyVectorIndex(f"{tmp}/none", quantization="none")
+        exact_index.add(ids, vectors, metadatas)
+        exact = [exact_index.search(query, args.top_k) for query in queries]
+        full_bytes = exact_index.first_pass_bytes()
+
+        print(f"{len(ids)} vectors x {vectors.shape[1]} dims, top_k={args.top_k}, {len(queries)} queries\n")
+        print(
+            f"{'mode':>8} {'mult':>5} {'first-pass MB':>14} {'saved':>7} {'recall@k':>9} "
+            f"{'max score err':>14} {'p50 ms':>8}"
+        )
+        for mode in ("none", "float16", "int8"):
+            index = exact_index if mode == "none" else NumpyVectorIndex(f"{tmp}/{mode}", quantization=mode)
+            if mode != "none":
+                index.add(ids, vectors, metadatas)
+
+            for multiplier in args.multipliers if mode != "none" else [1]:
+                index.rescore_multiplier = multiplier
+                recalls, errors, times = [], [0.0], []
+                for query, expected in zip(queries, exact):
+                    start = time.perf_counter()
+                    hits = index.search(query, args.top_k)
+                    times.append(time.perf_counter() - start)
+
+                    expected_scores = {hit["id"]: hit["similarity"] for hit in expected}
+                    recalls.append(len(expected_scores.keys() & {hit["id"] for hit in hits}) / len(expected))
+                    errors += [abs(expected_scores[h["id"]] - h["similarity"]) for h in hits if h["id"] in expected_scores]
+
+                first_pass = index.first_pass_bytes()
+                print(
+                    f"{mode:>8} {multiplier if mode != 'none' else '-':>5} {first_pass / 1e6:>14.2f} "
+                    f"{1 - first_pass / full_bytes:>7.0%} {np.mean(recalls):>9.4f} {max(errors):>14.2e} "
+                    f"{np.percentile(times, 50) * 1000:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
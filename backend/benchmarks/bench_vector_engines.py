@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Vector engine benchmark: Chroma (HNSW + SQLite metadata) vs the exact NumpyVectorIndex.
+
+Builds both engines over the same synthetic clustered, normalized embeddings with
+SSC-style metadata, then reports per-query latency (p50/p95) for unfiltered,
+subject-filtered and subject+year-filtered searches, plus Chroma's recall@k against
+the exact top-k from the NumPy engine.
+
+Run from the backend directory:
+    python -m benchmarks.bench_vector_engines
+    python -m benchmarks.bench_vector_engines --size 50000 --queries 500 --top-k 10
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app.vector_index import NumpyVectorIndex
+from benchmarks.bench_parser import SECTIONS
+
+PAPER_TYPES = ["CGL", "CHSL", "MTS", "GD"]
+YEARS = list(range(2015, 2025))
+
+
+def synthetic_corpus(size: int, dim: int, seed: int = 0):
+    """Clustered unit vectors (topics) with subject/year/paper_type metadata"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, size // 50), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), size)] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    metadatas = [
+        {
+            "text": f"question {i}",
+            "subject": SECTIONS[int(rng.integers(len(SECTIONS)))],
+            "year": YEARS[int(rng.integers(len(YEARS)))],
+            "paper_type": PAPER_TYPES[int(rng.integers(len(PAPER_TYPES)))],
+            "question_id": f"q{i}",
+        }
+        for i in range(size)
+    ]
+    queries = vectors[rng.integers(0, size, 10_000)] + 0.3 * rng.standard_normal((10_000, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, metadatas, queries
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000, help="questions in the corpus")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    import chromadb
+
+    vectors, metadatas, queries = synthetic_corpus(args.size, args.dim)
+    queries = queries[: args.queries]
+    ids = [m["question_id"] for m in metadatas]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        collection = chromadb.PersistentClient(path=f"{tmp}/chroma").get_or_create_collection("bench")
+        for i in range(0, args.size, 5000):
+            collection.add(
+                ids=ids[i : i + 5000],
+                embeddings=vectors[i : i + 5000].tolist(),
+                metadatas=metadatas[i : i + 5000],
+                documents=[m["text"] for m in metadatas[i : i + 5000]],
+            )
+        chroma_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = NumpyVectorIndex(f"{tmp}/numpy")
+        for i in range(0, args.size, 5000):
+            index.add(ids[i : i + 5000], vectors[i : i + 5000], metadatas[i : i + 5000])
+        numpy_build = time.perf_counter() - start
+        print(f"corpus {args.size} x {args.dim}: build chroma {chroma_build:.1f}s, numpy {numpy_build:.1f}s\n")
+
+        scenarios = [
+            ("unfiltered", None, {}),
+            ("subject", {"subject": {"$eq": SECTIONS[0]}}, {"subjects": [SECTIONS[0]]}),
+            (
+                "subject+year",
+                {"$and": [{"subject": {"$eq": SECTIONS[0]}}, {"year": {"$eq": YEARS[0]}}]},
+                {"subjects": [SECTIONS[0]], "years": [YEARS[0]]},
+            ),
+        ]
+
+        print(f"{'filter':>14} {'engine':>7} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+        for name, where, filters in scenarios:
+            chroma_times, numpy_times, recalls = [], [], []
+            for query in queries:
+                start = time.perf_counter()
+                result = collection.query(query_embeddings=[query.tolist()], n_results=args.top_k, where=where)
+                chroma_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                hits = index.search(query, args.top_k, **filters)
+                numpy_times.append(time.perf_counter() - start)
+
+                exact = {hit["id"] for hit in hits}
+                if exact:
+                    recalls.append(len(exact & set(result["ids"][0])) / len(exact))
+
+            print(
+                f"{name:>14} {'chroma':>7} {percentile_ms(chroma_times, 50):>8.2f} "
+                f"{percentile_ms(chroma_times, 95):>8.2f} {np.mean(recalls):>9.3f}"
+            )
+            print(
+                f"{name:>14} {'numpy':>7} {percentile_ms(numpy_times, 50):>8.2f} "
+                f"{percentile_ms(numpy_times, 95):>8.2f} {1.0:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
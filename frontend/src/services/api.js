@@ -20,6 +20,27 @@ export const queryQuestions = async (question, subject = null) => {
   return response.data;
 };
 
+// Related questions from the stored embedding - no need to re-send the question text
+export const getSimilarQuestions = async (questionId, subject = null, topK = 5) => {
+  const response = await api.get(`/questions/${encodeURIComponent(questionId)}/similar`, {
+    params: { top_k: topK, subject }
+  });
+  return response.data;
+};
+
+// Browse stored questions; pass the previous page's next_cursor to continue
+export const listQuestions = async ({ cursor = null, pageSize = 20, subject = null, year = null } = {}) => {
+  const response = await api.get('/questions', {
+    params: { cursor, page_size: pageSize, subject, year }
+  });
+  return response.data;
+};
+
+export const updateQuestion = async (questionId, changes) => {
+  const response = await api.patch(`/questions/${encodeURIComponent(questionId)}`, changes);
+  return response.data;
+};
+
 export const getSubjects = async () => {
   const response = await api.get('/subjects');
   return response.data;